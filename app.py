@@ -5,85 +5,164 @@ app.py – Flask web server for the Interactive Flood Susceptibility GUI.
 Endpoints:
     GET  /                      → serves the single-page Leaflet app
     POST /api/analyze           → runs the 6-factor pipeline, returns results
-    GET  /api/overlay/<job_id>  → serves the risk raster as a PNG
+    GET  /api/overlay/<job_id>  → serves the risk raster as WebP (PNG fallback)
 """
 
 import os
 import sys
-import json
 import uuid
-import copy
 import traceback
 import io
 import base64
+import hashlib
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import requests as http_requests
 
 import numpy as np
+import orjson
+import rasterio
+from rasterio.enums import Resampling
+from PIL import Image
 from flask import Flask, render_template, request, jsonify, send_file
+from flask.json.provider import JSONProvider
+from numba import njit, prange
+from matplotlib.colors import LinearSegmentedColormap
 
 # Ensure project root on path
 sys.path.insert(0, os.path.dirname(__file__))
 
+# GDAL tuning – must be set before rasterio initialises GDAL
+os.environ.setdefault("GDAL_NUM_THREADS", "ALL_CPUS")
+os.environ.setdefault("GDAL_CACHEMAX", "512")
+os.environ.setdefault("CPL_TMPDIR", "/tmp")
+
 import config
 
 app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
 
-# Custom JSON encoder for numpy types
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (np.integer,)):
-            return int(obj)
-        if isinstance(obj, (np.floating,)):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, np.bool_):
-            return bool(obj)
-        if isinstance(obj, float) and np.isnan(obj):
-            return None
-        return super().default(obj)
-
-
-app.json_encoder = NumpyEncoder
-
-
-def _sanitize_for_json(obj):
-    """Recursively convert numpy types to native Python for JSON."""
-    if isinstance(obj, dict):
-        return {k: _sanitize_for_json(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [_sanitize_for_json(i) for i in obj]
-    if isinstance(obj, (np.integer,)):
-        return int(obj)
-    if isinstance(obj, (np.floating,)):
-        v = float(obj)
-        return None if np.isnan(v) else v
+def _sanitize_leaf(obj):
+    """orjson default hook – only reached for types orjson can't serialise."""
+    if isinstance(obj, np.generic):
+        v = obj.item()
+        return None if isinstance(v, float) and not np.isfinite(v) else v
     if isinstance(obj, np.ndarray):
+        # non-contiguous or unsupported dtype; tolist() NaNs are written as null
         return obj.tolist()
-    if isinstance(obj, np.bool_):
-        return bool(obj)
-    if isinstance(obj, float) and (np.isnan(obj) or np.isinf(obj)):
-        return None
-    return obj
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson: numpy arrays/scalars are
+    serialised straight from their buffers and NaN/inf become null, so
+    jsonify() needs no sanitising pass or .tolist() conversions.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=_ORJSON_OPTS, default=_sanitize_leaf).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=_ORJSON_OPTS, default=_sanitize_leaf),
+            mimetype="application/json",
+        )
+
+
+app.json = OrjsonProvider(app)
 
 # In-memory job store  { job_id: { status, progress, result, error } }
-jobs = {}
+# Bounded LRU: each finished job holds the full road GeoJSON, so an
+# unbounded dict grows for the lifetime of the server.
+# jobs_lock guards the store's structure (insert, evict, LRU reorder);
+# per-job fields are updated with single GIL-atomic dict writes, and a
+# running job is never evicted, so progress updates and reads skip it.
+jobs = OrderedDict()
 jobs_lock = threading.Lock()
 
-# GEE initialised flag
+# Encoded overlay bytes { job_id: { mimetype: (bytes, etag) } } – evicted
+# with the job.  WebP is rendered per job; PNG only on demand for clients
+# that don't accept WebP.
+_overlay_cache = {}
+_OVERLAY_ENCODE = {
+    "image/webp": dict(format="WEBP", quality=85, method=4),
+    # Fast deflate: encode time matters far more than the few % of
+    # bytes level 6 would save
+    "image/png": dict(format="PNG", compress_level=1, optimize=False),
+}
+
+
+def _encode_overlay(img, mimetype):
+    """Encode a PIL image for *mimetype* → (bytes, etag)."""
+    buf = io.BytesIO()
+    img.save(buf, **_OVERLAY_ENCODE[mimetype])
+    data = buf.getvalue()
+    return data, hashlib.md5(data).hexdigest()[:16]
+
+
+def _evict_jobs():
+    """Drop least-recently-used finished jobs beyond MAX_JOBS (call with jobs_lock held)."""
+    excess = len(jobs) - config.MAX_JOBS
+    if excess <= 0:
+        return
+    for old_id in [k for k, j in jobs.items() if j["status"] != "running"][:excess]:
+        del jobs[old_id]
+        _overlay_cache.pop(old_id, None)
+        overlay_path = os.path.join(config.OUTPUT_DIR, f"risk_overlay_{old_id}.webp")
+        try:
+            os.remove(overlay_path)
+        except OSError:
+            pass
+
+# GEE initialised flag (double-checked under _gee_lock so concurrent
+# first jobs don't both call initialize_ee)
 _gee_ready = False
+_gee_lock = threading.Lock()
+
+# Pooled keep-alive HTTP session for Overpass (skips TCP/TLS setup per job)
+_http = http_requests.Session()
+_http.mount("https://", http_requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+_OVERPASS_BUILDINGS_QUERY = (
+    '[out:json][timeout:15];'
+    '(way["building"]({south},{west},{north},{east}););'
+    'out center qt 150;'
+)
+
+# ── Smooth green → yellow → red color ramp ─────────────────────────────────
+_RISK_COLORS = [
+    (0.18, 0.80, 0.25),   # green  (safe)
+    (0.55, 0.90, 0.20),   # lime
+    (1.00, 0.92, 0.23),   # yellow (moderate)
+    (1.00, 0.60, 0.15),   # orange
+    (0.90, 0.20, 0.15),   # red    (danger)
+]
+_CMAP_LUT = LinearSegmentedColormap.from_list(
+    "flood_risk", _RISK_COLORS, N=256
+)(np.linspace(0, 1, 256)).astype(np.float32)
 
 
 def _ensure_gee():
     """Lazy-init GEE once."""
     global _gee_ready
-    if not _gee_ready:
-        from src.gee_data import initialize_ee
-        initialize_ee()
-        _gee_ready = True
+    if _gee_ready:
+        return
+    with _gee_lock:
+        if not _gee_ready:
+            from src.gee_data import initialize_ee
+            initialize_ee()
+            _gee_ready = True
 
 
 # ── Routes ──────────────────────────────────────────────────────────────────
@@ -109,6 +188,7 @@ def analyze():
     job_id = str(uuid.uuid4())[:8]
     with jobs_lock:
         jobs[job_id] = {"status": "running", "progress": "Initialising...", "result": None, "error": None}
+        _evict_jobs()
 
     thread = threading.Thread(
         target=_run_pipeline,
@@ -125,33 +205,62 @@ def job_status(job_id):
     """Poll job progress."""
     with jobs_lock:
         job = jobs.get(job_id)
+        if job:
+            jobs.move_to_end(job_id)
     if not job:
         return jsonify({"error": "Job not found"}), 404
-    # Use json.dumps with NumpyEncoder for safety
     try:
-        return app.response_class(
-            response=json.dumps(job, cls=NumpyEncoder),
-            mimetype='application/json',
-        )
+        return jsonify(job)
     except Exception as e:
         return jsonify({"status": job.get("status"), "progress": job.get("progress"), "error": str(e)})
 
 
 @app.route("/api/overlay/<job_id>")
 def risk_overlay(job_id):
-    """Serve the risk PNG overlay for the given job."""
-    png_path = os.path.join(config.OUTPUT_DIR, f"risk_overlay_{job_id}.png")
-    if os.path.exists(png_path):
-        return send_file(png_path, mimetype="image/png")
-    return jsonify({"error": "Overlay not ready"}), 404
+    """Serve the risk overlay for the given job (WebP, PNG fallback)."""
+    mimetype = "image/webp" if request.accept_mimetypes["image/webp"] else "image/png"
+    encoded = _overlay_cache.get(job_id)
+    if encoded is None:
+        # Not cached (e.g. after a restart) – fall back to the file on disk
+        overlay_path = os.path.join(config.OUTPUT_DIR, f"risk_overlay_{job_id}.webp")
+        if not os.path.exists(overlay_path):
+            return jsonify({"error": "Overlay not ready"}), 404
+        with open(overlay_path, "rb") as f:
+            data = f.read()
+        encoded = {"image/webp": (data, hashlib.md5(data).hexdigest()[:16])}
+    if mimetype not in encoded:
+        with Image.open(io.BytesIO(encoded["image/webp"][0])) as img:
+            encoded[mimetype] = _encode_overlay(img, mimetype)
+
+    data, etag = encoded[mimetype]
+    resp = send_file(io.BytesIO(data), mimetype=mimetype,
+                     etag=etag, conditional=True, max_age=3600)
+    resp.vary.add("Accept")
+    # One overlay per job_id that never changes once written
+    resp.headers["Cache-Control"] = "public, max-age=3600, immutable"
+    return resp
+
+
+@lru_cache(maxsize=8)
+def _read_raster_cached(path, mtime, out_shape=None, resampling=None):
+    """
+    Band 1 of *path* (optionally resampled inside GDAL on read) plus its
+    bounds. Keyed on mtime so a rewritten GeoTIFF is re-read; the array
+    is returned read-only since it is shared between callers.
+    """
+    with rasterio.open(path) as src:
+        if out_shape is None:
+            band = src.read(1)
+        else:
+            band = src.read(1, out_shape=out_shape, resampling=resampling)
+        bounds = src.bounds
+    band.flags.writeable = False
+    return band, bounds
 
 
 @app.route("/api/terrain3d/<job_id>")
 def terrain3d_data(job_id):
     """Serve high-resolution DEM + FSI grids as JSON for professional 3D view."""
-    import rasterio
-    from scipy.ndimage import zoom
-
     risk_tif = os.path.join(config.OUTPUT_DIR, config.RISK_GEOTIFF)
     dem_tif = os.path.join(config.OUTPUT_DIR, "dem_terrain.tif")
 
@@ -162,92 +271,108 @@ def terrain3d_data(job_id):
     DEM_GRID = 256  # 256×256 for smooth terrain surface
     FSI_GRID = 128  # 128×128 for color overlay (lower res is fine)
 
-    with rasterio.open(dem_tif) as src:
-        dem_band = src.read(1)
-        bounds = src.bounds
-        transform = src.transform
-
-    with rasterio.open(risk_tif) as src:
-        fsi_band = src.read(1)
-
-    # High-res DEM with bicubic interpolation for smooth terrain
-    dem_highres = zoom(dem_band, (DEM_GRID / dem_band.shape[0], DEM_GRID / dem_band.shape[1]), order=3)
-    
-    # Medium-res FSI with bilinear interpolation
-    fsi_midres = zoom(fsi_band, (FSI_GRID / fsi_band.shape[0], FSI_GRID / fsi_band.shape[1]), order=1)
+    # High-res DEM with bicubic, medium-res FSI with bilinear interpolation
+    dem_highres, bounds = _read_raster_cached(
+        dem_tif, os.path.getmtime(dem_tif), (DEM_GRID, DEM_GRID), Resampling.cubic,
+    )
+    fsi_midres, _ = _read_raster_cached(
+        risk_tif, os.path.getmtime(risk_tif), (FSI_GRID, FSI_GRID), Resampling.bilinear,
+    )
 
     # Replace NaN with 0
     dem_highres = np.nan_to_num(dem_highres, nan=0.0)
     fsi_midres = np.nan_to_num(fsi_midres, nan=0.0)
 
-    # Compute elevation statistics for vertical scale reference
-    dem_mean = float(np.mean(dem_highres[dem_highres > 0]))
-    dem_std = float(np.std(dem_highres[dem_highres > 0]))
+    # Compute elevation statistics for vertical scale reference (the grids
+    # are NaN-free now, so plain reductions; the >0 gather is done once)
+    dem_valid = dem_highres[dem_highres > 0]
+    dem_mean = float(dem_valid.mean())
+    dem_std = float(np.sqrt(np.mean(np.square(dem_valid - dem_mean))))
+    dem_min = float(dem_highres.min())
+    dem_max = float(dem_highres.max())
+    fsi_min = float(fsi_midres.min())
+    fsi_max = float(fsi_midres.max())
+
+    # Compact payload: DEM as uint16 steps over [dem_min, dem_max] and FSI
+    # as uint8 over [0, 1], little-endian raw buffers in base64
+    dem_scale = (dem_max - dem_min) / 65535.0 if dem_max > dem_min else 1.0
+    dem_q = np.rint((dem_highres - dem_min) / dem_scale).astype("<u2")
+    fsi_q = np.rint(np.clip(fsi_midres, 0.0, 1.0) * 255.0).astype(np.uint8)
 
     # Get buildings + evac from the job result
-    with jobs_lock:
-        job = jobs.get(job_id, {})
+    job = jobs.get(job_id, {})
     result = job.get("result", {}) or {}
 
-    return app.response_class(
-        response=json.dumps({
-            "dem": dem_highres.tolist(),
-            "fsi": fsi_midres.tolist(),
-            "dem_rows": DEM_GRID,
-            "dem_cols": DEM_GRID,
-            "fsi_rows": FSI_GRID,
-            "fsi_cols": FSI_GRID,
-            "dem_min": float(np.nanmin(dem_highres)),
-            "dem_max": float(np.nanmax(dem_highres)),
-            "dem_mean": dem_mean,
-            "dem_std": dem_std,
-            "fsi_min": float(np.nanmin(fsi_midres)),
-            "fsi_max": float(np.nanmax(fsi_midres)),
-            "bounds": {
-                "south": bounds.bottom, "west": bounds.left,
-                "north": bounds.top, "east": bounds.right,
-            },
-            "buildings": result.get("buildings", []),
-            "evacuation_route": result.get("evacuation_route"),
-            "escape_destination": result.get("escape_destination"),
-            "resolution_meters": config.EXPORT_SCALE,
-        }, cls=NumpyEncoder),
-        mimetype='application/json',
-    )
+    return jsonify({
+        "dem_b64": base64.b64encode(dem_q.tobytes()).decode("ascii"),
+        "dem_offset": dem_min,
+        "dem_scale": dem_scale,
+        "fsi_b64": base64.b64encode(fsi_q.tobytes()).decode("ascii"),
+        "fsi_scale": 1.0 / 255.0,
+        "dem_rows": DEM_GRID,
+        "dem_cols": DEM_GRID,
+        "fsi_rows": FSI_GRID,
+        "fsi_cols": FSI_GRID,
+        "dem_min": dem_min,
+        "dem_max": dem_max,
+        "dem_mean": dem_mean,
+        "dem_std": dem_std,
+        "fsi_min": fsi_min,
+        "fsi_max": fsi_max,
+        "bounds": {
+            "south": bounds.bottom, "west": bounds.left,
+            "north": bounds.top, "east": bounds.right,
+        },
+        "buildings": result.get("buildings", []),
+        "evacuation_route": result.get("evacuation_route"),
+        "escape_destination": result.get("escape_destination"),
+        "resolution_meters": config.EXPORT_SCALE,
+    })
 
 
 # ── Pipeline runner ─────────────────────────────────────────────────────────
 
 
 def _update_progress(job_id, msg):
-    with jobs_lock:
-        if job_id in jobs:
-            jobs[job_id]["progress"] = msg
+    job = jobs.get(job_id)
+    if job is not None:
+        job["progress"] = msg
 
 
 def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
     """Run the full 6-factor pipeline and store results."""
+    # Independent I/O-bound stages (OSM/Overpass downloads, GEE export,
+    # overlay render)
+    pool = ThreadPoolExecutor(max_workers=6)
     try:
         _update_progress(job_id, "Connecting to Google Earth Engine...")
         _ensure_gee()
 
         import ee
-        from src.gee_data import create_aoi, fetch_dem, compute_slope, fetch_soil, ee_image_to_numpy
+        from src.gee_data import (
+            create_aoi, fetch_dem, compute_slope, fetch_soil, ee_image_to_numpy,
+            ee_image_to_grid, aoi_pixel_mask,
+        )
         from src.preprocessing import (
             normalize_elevation, normalize_slope,
-            compute_soil_index,
+            compute_soil_index, terrain_min_max,
         )
         from src.hydrology import (
             fetch_water_features, compute_river_proximity,
             compute_flow_accumulation, normalize_flow_accumulation,
             numpy_to_ee_image,
         )
-        from src.ahp import get_validated_weights
         from src.flood_model import (
-            compute_base_risk, apply_rainfall_multiplier, apply_water_mask,
+            compute_base_risk, compute_fsi,
             classify_risk, export_geotiff,
+            compute_base_risk_np, apply_rainfall_multiplier_np, apply_water_mask_np,
+            classify_risk_np, write_geotiff,
+        )
+        from src.ahp import get_validated_weights
+        from src.road_network import (
+            load_road_network, sample_edge_risk, safe_node_arrays,
+            edge_arrays, penalized_lengths,
         )
-        from src.road_network import load_road_network, sample_risk_on_edges, penalize_flooded_edges, label_safe_nodes
         from src.evacuation import find_escape_route
         from src.decision_support import compute_risk_statistics, count_affected_roads
 
@@ -257,7 +382,13 @@ def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
 
         # Phase 1: AOI
         _update_progress(job_id, "Creating area of interest...")
-        aoi = create_aoi(lat, lon, radius_km)
+        aoi, bounds = create_aoi(lat, lon, radius_km, with_bounds=True)
+
+        # OSM/Overpass downloads depend only on the AOI – start them now so
+        # they overlap the GEE round-trips below
+        water_future = pool.submit(fetch_water_features, lat, lon, radius_km * 1000)
+        roads_future = pool.submit(load_road_network, lat, lon, radius_km * 1000)
+        buildings_future = pool.submit(_fetch_buildings, bounds)
 
         # Phase 2: Terrain
         _update_progress(job_id, "Fetching terrain data from GEE...")
@@ -266,61 +397,110 @@ def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
         clay, sand = fetch_soil(aoi)
 
         _update_progress(job_id, "Preprocessing terrain factors...")
-        elev_factor = normalize_elevation(dem, aoi)
-        slope_factor = normalize_slope(slope, aoi)
+        terrain_stats = terrain_min_max(dem, slope, aoi)
+        elev_factor = normalize_elevation(dem, aoi, terrain_stats)
+        slope_factor = normalize_slope(slope, aoi, terrain_stats)
         soil_factor = compute_soil_index(clay, sand)
 
         # Phase 3: Hydrology
         _update_progress(job_id, "Fetching river data from OpenStreetMap...")
-        water_gdf = fetch_water_features(lat, lon, radius_km * 1000)
-
-        aoi_bounds_info = aoi.bounds().getInfo()["coordinates"][0]
-        lons = [p[0] for p in aoi_bounds_info]
-        lats = [p[1] for p in aoi_bounds_info]
-        bounds = (min(lons), min(lats), max(lons), max(lats))
+        water_gdf = water_future.result()
 
         _update_progress(job_id, "Computing river proximity & water mask...")
         river_array, water_mask_np, river_meta = compute_river_proximity(water_gdf, bounds)
-        river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
-        water_mask_ee = numpy_to_ee_image(water_mask_np.astype(float), bounds, "water_mask")
-
-        _update_progress(job_id, "Computing flow accumulation...")
-        dem_np = ee_image_to_numpy(dem, aoi)
-        flow_accum_raw = compute_flow_accumulation(dem_np)
-        flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
-        flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
-
-        # Phase 4: BaseRisk × RainFactor
-        _update_progress(job_id, "Computing base susceptibility (5-factor)...")
-        base_risk = compute_base_risk(
-            elev_factor, slope_factor, soil_factor,
-            river_factor=river_factor_ee,
-            flow_accum_factor=flow_accum_ee,
-            weights=ahp_weights,
-        )
 
-        _update_progress(job_id, f"Applying rainfall multiplier ({rainfall_mm}mm)...")
-        fsi = apply_rainfall_multiplier(base_risk, rainfall_mm)
-        fsi = apply_water_mask(fsi, water_mask_ee, rainfall_mm)
-        risk_classified = classify_risk(fsi)
+        if config.LOCAL_FSI:
+            # All factors on the river grid; FSI computed in NumPy, so no
+            # numpy → EE uploads and no EE → GeoTIFF exports of the result.
+            grid_transform = river_meta["transform"]
+            grid_shape = (river_meta["height"], river_meta["width"])
+
+            _update_progress(job_id, "Downloading terrain factors...")
+            stack = ee_image_to_grid(
+                ee.Image.cat([dem, elev_factor, slope_factor, soil_factor]),
+                aoi, grid_transform, grid_shape,
+            )
+            stack[:, ~aoi_pixel_mask(lat, lon, radius_km, grid_transform, grid_shape)] = np.nan
+            dem_grid, elev_np, slope_np, soil_np = stack
+
+            _update_progress(job_id, "Computing flow accumulation...")
+            # Outside the AOI acts as a flat rim at the max elevation (no outflow)
+            dem_filled = np.where(np.isnan(dem_grid), np.nanmax(dem_grid), dem_grid)
+            flow_accum_raw = compute_flow_accumulation(dem_filled)
+            flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
+
+            _update_progress(job_id, "Computing base susceptibility (5-factor)...")
+            base_risk_np = compute_base_risk_np(
+                elev_np, slope_np, soil_np,
+                river_factor=river_array,
+                flow_accum_factor=flow_accum_norm,
+                weights=ahp_weights,
+            )
+
+            _update_progress(job_id, f"Applying rainfall multiplier ({rainfall_mm}mm)...")
+            fsi_np = apply_rainfall_multiplier_np(base_risk_np, rainfall_mm)
+            fsi_np = apply_water_mask_np(fsi_np, water_mask_np, rainfall_mm)
+            classified_np = classify_risk_np(fsi_np)
+
+            risk_tif = write_geotiff(fsi_np, grid_transform, config.RISK_GEOTIFF)
+            dem_tif = write_geotiff(dem_grid, grid_transform, "dem_terrain.tif")
+            classified_future = pool.submit(
+                write_geotiff, classified_np, grid_transform,
+                "flood_risk_classified.tif", nodata=0,
+            )
+            overlay_bands = {"risk_band": fsi_np, "dem_band": dem_grid}
+            risk_grid = {"band": fsi_np, "transform": grid_transform}
+        else:
+            river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
+            water_mask_ee = numpy_to_ee_image(water_mask_np, bounds, "water_mask")
+
+            _update_progress(job_id, "Computing flow accumulation...")
+            dem_np = ee_image_to_numpy(dem, aoi, bounds=bounds)
+            flow_accum_raw = compute_flow_accumulation(dem_np)
+            flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
+            flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
+
+            # Phase 4: BaseRisk × RainFactor
+            _update_progress(job_id, "Computing base susceptibility (5-factor)...")
+            base_risk = compute_base_risk(
+                elev_factor, slope_factor, soil_factor,
+                river_factor=river_factor_ee,
+                flow_accum_factor=flow_accum_ee,
+                weights=ahp_weights,
+            )
+
+            _update_progress(job_id, f"Applying rainfall multiplier ({rainfall_mm}mm)...")
+            fsi = compute_fsi(base_risk, water_mask_ee, rainfall_mm)
+            risk_classified = classify_risk(fsi)
 
-        risk_tif = export_geotiff(fsi, aoi, config.RISK_GEOTIFF)
-        dem_tif = export_geotiff(dem, aoi, "dem_terrain.tif")
-        export_geotiff(risk_classified, aoi, "flood_risk_classified.tif")
+            risk_tif = export_geotiff(fsi, aoi, config.RISK_GEOTIFF)
+            dem_tif = export_geotiff(dem, aoi, "dem_terrain.tif")
+
+            # Classified export is unused in-pipeline – run it in the background
+            classified_future = pool.submit(
+                export_geotiff, risk_classified, aoi, "flood_risk_classified.tif"
+            )
+            overlay_bands = {}
+            risk_grid = {}
 
         # Generate risk overlay PNG
         _update_progress(job_id, "Generating risk map overlay...")
-        overlay_data = _create_risk_png(risk_tif, job_id, dem_tif_path=dem_tif)
+        png_future = pool.submit(
+            _create_risk_png, risk_tif, job_id, dem_tif_path=dem_tif, **overlay_bands
+        )
 
         # Phase 5: Fetch buildings from OSM Overpass
         _update_progress(job_id, "Fetching buildings from OpenStreetMap...")
         buildings_data = []
         try:
-            buildings_data = _fetch_buildings(bounds)
+            buildings_data = buildings_future.result()
             print(f"[APP] Fetched {len(buildings_data)} buildings from OSM")
         except Exception as e:
             print(f"[APP] Building fetch failed: {e}")
 
+        png_future.result()
+        classified_future.result()
+
         # Phase 6: Roads + Flood Escape Routing
         _update_progress(job_id, "Analysing road network...")
         road_geojson = None
@@ -329,19 +509,24 @@ def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
         road_stats = None
 
         try:
-            road_graph = load_road_network(lat, lon, radius_km * 1000)
-            road_graph = sample_risk_on_edges(road_graph, risk_tif)
+            # The graph is the shared per-AOI cache, so this job's risk and
+            # safe-zone labels stay in local arrays instead of attributes
+            # (a concurrent job on the same AOI would overwrite them)
+            road_graph = roads_future.result()
+            edges = edge_arrays(road_graph)
+            edges["flood_risk"] = sample_edge_risk(road_graph, risk_tif)
 
             # Extract road GeoJSON for frontend
-            road_geojson = _roads_to_geojson(road_graph)
-            road_stats = count_affected_roads(road_graph)
+            road_geojson = _roads_to_geojson(road_graph, edges["flood_risk"])
+            road_stats = count_affected_roads(road_graph, flood_risk=edges["flood_risk"])
 
             _update_progress(job_id, "Computing escape route to safe zone...")
-            road_graph_safe = penalize_flooded_edges(copy.deepcopy(road_graph))
-            road_graph_safe = label_safe_nodes(road_graph_safe, risk_tif)
+            node_fsi, is_safe = safe_node_arrays(road_graph, risk_tif)
 
             evac_route, escape_dest = find_escape_route(
-                road_graph_safe, lat, lon
+                road_graph, lat, lon,
+                weight=penalized_lengths(edges["length"], edges["flood_risk"]),
+                edges=edges, fsi=node_fsi, is_safe=is_safe,
             )
             if evac_route:
                 evac_geojson = _route_to_geojson(evac_route)
@@ -352,7 +537,7 @@ def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
         # Phase 7: Statistics + Impact
         _update_progress(job_id, "Computing risk statistics...")
         risk_stats = compute_risk_statistics(risk_tif)
-        impact_stats = _compute_impact_stats(buildings_data, risk_tif)
+        impact_stats = _compute_impact_stats(buildings_data, risk_tif, **risk_grid)
 
         # Assemble result
         result = {
@@ -375,125 +560,217 @@ def _run_pipeline(job_id, lat, lon, radius_km, rainfall_mm):
             },
         }
 
-        with jobs_lock:
-            jobs[job_id]["status"] = "done"
-            jobs[job_id]["progress"] = "Complete"
-            jobs[job_id]["result"] = _sanitize_for_json(result)
+        # One update() so a poll never sees status="done" without the result
+        jobs[job_id].update(status="done", progress="Complete", result=result)
 
     except Exception as e:
         traceback.print_exc()
-        with jobs_lock:
-            jobs[job_id]["status"] = "error"
-            jobs[job_id]["error"] = str(e)
-            jobs[job_id]["progress"] = f"Error: {e}"
+        jobs[job_id].update(status="error", error=str(e), progress=f"Error: {e}")
+    finally:
+        pool.shutdown(wait=False)
 
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
 
 
-def _create_risk_png(risk_tif_path, job_id, dem_tif_path=None):
+# fastmath without nnan/ninf: NaN risk pixels must survive to set alpha = 0
+_FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+
+@njit(inline="always")
+def _bilinear(a, sy, sx):
+    """Bilinear sample of 2D array *a* at fractional source coords (sy, sx)."""
+    h, w = a.shape
+    y0 = int(sy)
+    x0 = int(sx)
+    y1 = min(y0 + 1, h - 1)
+    x1 = min(x0 + 1, w - 1)
+    fy = sy - y0
+    fx = sx - x0
+    top = (1.0 - fx) * a[y0, x0] + fx * a[y0, x1]
+    bot = (1.0 - fx) * a[y1, x0] + fx * a[y1, x1]
+    return (1.0 - fy) * top + fy * bot
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True, nogil=True)
+def _fuse_upsample_colorize_hillshade(
+    risk_lo, dem_lo, cmap_lut, vmin, vmax, shade, fsi_opacity, alpha, out_rgba_u8,
+):
+    """
+    Fused overlay kernel: one pass over the upsampled grid doing
+    bilinear resample (risk + DEM) → colormap lookup → hillshade → blend,
+    writing uint8 RGBA straight into *out_rgba_u8*.
+
+    Sampling grid matches scipy.ndimage.zoom(order=1) (corner-aligned) and
+    the DEM gradient matches np.gradient on the upsampled DEM.
+    """
+    h, w = risk_lo.shape
+    oh, ow = out_rgba_u8.shape[0], out_rgba_u8.shape[1]
+    ry = (h - 1) / (oh - 1) if oh > 1 else 0.0
+    rx = (w - 1) / (ow - 1) if ow > 1 else 0.0
+    span = vmax - vmin
+    inv_span = 1.0 / span if span > 0 else 0.0
+    n_lut = cmap_lut.shape[0]
+
+    # Hillshade constants (azimuth=315°, altitude=45°)
+    az = np.radians(315.0)
+    alt = np.radians(45.0)
+    sin_alt = np.sin(alt)
+    cos_alt = np.cos(alt)
+    cos_az = np.cos(az)
+    sin_az = np.sin(az)
+    alpha_u8 = np.uint8(alpha * 255)
+
+    for y in prange(oh):
+        ya = max(y - 1, 0)
+        yb = min(y + 1, oh - 1)
+        for x in range(ow):
+            r = _bilinear(risk_lo, y * ry, x * rx)
+            if np.isnan(r):
+                out_rgba_u8[y, x, 0] = 0
+                out_rgba_u8[y, x, 1] = 0
+                out_rgba_u8[y, x, 2] = 0
+                out_rgba_u8[y, x, 3] = 0
+                continue
+
+            # Same bucketing as matplotlib Colormap.__call__ on [0, 1]
+            idx = int((r - vmin) * inv_span * n_lut)
+            idx = min(max(idx, 0), n_lut - 1)
+            cr = cmap_lut[idx, 0]
+            cg = cmap_lut[idx, 1]
+            cb = cmap_lut[idx, 2]
+
+            if shade:
+                xa = max(x - 1, 0)
+                xb = min(x + 1, ow - 1)
+                dy = (_bilinear(dem_lo, yb * ry, x * rx)
+                      - _bilinear(dem_lo, ya * ry, x * rx)) / (yb - ya)
+                dx = (_bilinear(dem_lo, y * ry, xb * rx)
+                      - _bilinear(dem_lo, y * ry, xa * rx)) / (xb - xa)
+                # sin(alt)·cos(slope) + cos(alt)·sin(slope)·cos(az − aspect)
+                # with slope = atan(m), aspect = atan2(−dy, dx), m = |∇z|
+                # reduces to one sqrt and a division – no trig per pixel
+                hs = ((sin_alt + cos_alt * (cos_az * dx - sin_az * dy))
+                      / np.sqrt(1.0 + dx * dx + dy * dy))
+                if not hs > 0.0:  # also catches NaN DEM pixels
+                    hs = 0.0
+                elif hs > 1.0:
+                    hs = 1.0
+                cr = fsi_opacity * cr + (1.0 - fsi_opacity) * hs
+                cg = fsi_opacity * cg + (1.0 - fsi_opacity) * hs
+                cb = fsi_opacity * cb + (1.0 - fsi_opacity) * hs
+
+            out_rgba_u8[y, x, 0] = np.uint8(cr * 255)
+            out_rgba_u8[y, x, 1] = np.uint8(cg * 255)
+            out_rgba_u8[y, x, 2] = np.uint8(cb * 255)
+            out_rgba_u8[y, x, 3] = alpha_u8
+
+
+def _create_risk_png(risk_tif_path, job_id, dem_tif_path=None, risk_band=None, dem_band=None):
     """
-    Convert risk GeoTIFF to a smooth, high-quality PNG overlay.
+    Convert risk GeoTIFF to a smooth, high-quality overlay image (WebP).
 
     Enhancements (visualization only – model stays at 250m):
     1. Bilinear 4× upsampling for smooth pixels
     2. Hillshade underlay from DEM for terrain context
     3. Custom green → yellow → red color ramp
     4. 65% FSI opacity blended over hillshade
-    """
-    import rasterio
-    from matplotlib.colors import LinearSegmentedColormap
-    from PIL import Image
-    from scipy.ndimage import zoom
 
+    All four steps run in a single fused numba kernel on the low-res
+    rasters, so no 4×-upsampled float intermediates are allocated.
+
+    If the caller already holds the rasters in memory (risk_band /
+    dem_band), they are used directly instead of re-reading the GeoTIFFs.
+    """
     UPSAMPLE = 4  # 4× bilinear upsampling (250m → ~63m visual)
 
     # ── Read risk raster ────────────────────────────────────────────────
-    with rasterio.open(risk_tif_path) as src:
-        band = src.read(1)
-        bounds = src.bounds
-
-    # Bilinear upsample
-    band_up = zoom(band, UPSAMPLE, order=1)  # order=1 = bilinear
-
-    # Normalize FSI to [0, 1]
-    vmin, vmax = np.nanmin(band_up), np.nanmax(band_up)
-    if vmax - vmin > 0:
-        norm = (band_up - vmin) / (vmax - vmin)
+    # float32 halves the bytes the kernel streams; its arithmetic is
+    # still carried out in float64
+    if risk_band is not None:
+        band = np.ascontiguousarray(risk_band, dtype=np.float32)
     else:
-        norm = np.zeros_like(band_up)
-
-    # ── Smooth green → yellow → red color ramp ─────────────────────────
-    colors = [
-        (0.18, 0.80, 0.25),   # green  (safe)
-        (0.55, 0.90, 0.20),   # lime
-        (1.00, 0.92, 0.23),   # yellow (moderate)
-        (1.00, 0.60, 0.15),   # orange
-        (0.90, 0.20, 0.15),   # red    (danger)
-    ]
-    cmap = LinearSegmentedColormap.from_list("flood_risk", colors, N=256)
-    rgba = cmap(norm)
+        with rasterio.open(risk_tif_path) as src:
+            band = src.read(1, out_dtype=np.float32)
+
+    # Normalisation range (bilinear interpolation cannot exceed input range)
+    vmin, vmax = np.nanmin(band), np.nanmax(band)
+    if not (np.isfinite(vmin) and np.isfinite(vmax)):
+        vmin, vmax = 0.0, 0.0
 
     # ── Hillshade from DEM ──────────────────────────────────────────────
-    if dem_tif_path and os.path.exists(dem_tif_path):
+    shade = False
+    if dem_band is not None or (dem_tif_path and os.path.exists(dem_tif_path)):
         try:
-            with rasterio.open(dem_tif_path) as src:
-                dem_band = src.read(1)
-
-            dem_up = zoom(dem_band, UPSAMPLE, order=1)
-
-            # Compute hillshade (azimuth=315°, altitude=45°)
-            dy, dx = np.gradient(dem_up)
-            slope_rad = np.arctan(np.sqrt(dx**2 + dy**2))
-            aspect = np.arctan2(-dy, dx)
-            az = np.radians(315)
-            alt = np.radians(45)
-            hillshade = (
-                np.sin(alt) * np.cos(slope_rad)
-                + np.cos(alt) * np.sin(slope_rad) * np.cos(az - aspect)
-            )
-            hillshade = np.clip(hillshade, 0, 1)
-
-            # Blend: FSI color at 65% over hillshade at 35%
-            fsi_opacity = 0.65
-            for c in range(3):
-                rgba[..., c] = (
-                    fsi_opacity * rgba[..., c]
-                    + (1 - fsi_opacity) * hillshade
-                )
-            print("[VIZ] Hillshade blended with risk overlay")
+            if dem_band is not None:
+                dem_band = np.ascontiguousarray(dem_band, dtype=np.float32)
+            else:
+                with rasterio.open(dem_tif_path) as src:
+                    dem_band = src.read(1, out_dtype=np.float32)
+            if dem_band.shape != band.shape:
+                raise ValueError(f"DEM shape {dem_band.shape} != risk shape {band.shape}")
+            shade = True
         except Exception as e:
             print(f"[VIZ] Hillshade skipped: {e}")
+    if not shade:
+        dem_band = band
+
+    # Blend: FSI color at 65% over hillshade at 35%; alpha 0 where NaN
+    fsi_opacity = 0.65
+    h, w = band.shape
+    rgba = np.empty((h * UPSAMPLE, w * UPSAMPLE, 4), dtype=np.uint8)
+    _fuse_upsample_colorize_hillshade(
+        band, dem_band, _CMAP_LUT, float(vmin), float(vmax),
+        shade, fsi_opacity, 0.65, rgba,
+    )
+    if shade:
+        print("[VIZ] Hillshade blended with risk overlay")
 
-    # Set alpha: transparent where NaN, 65% elsewhere
-    rgba[..., 3] = np.where(np.isnan(band_up), 0, 0.65)
-
-    img = Image.fromarray((rgba * 255).astype(np.uint8))
+    img = Image.fromarray(rgba)
 
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
-    png_path = os.path.join(config.OUTPUT_DIR, f"risk_overlay_{job_id}.png")
-    img.save(png_path, format="PNG")
-    print(f"[VIZ] Overlay PNG saved ({img.size[0]}×{img.size[1]}) → {png_path}")
-    return png_path
-
-
-def _roads_to_geojson(G):
-    """Convert networkx road graph to GeoJSON FeatureCollection."""
-    features = []
-    for u, v, data in G.edges(data=True):
-        risk = data.get("flood_risk", 0.0)
-        feat = {
+    overlay_path = os.path.join(config.OUTPUT_DIR, f"risk_overlay_{job_id}.webp")
+    # WebP encodes faster and smaller than PNG for this smooth gradient
+    data, etag = _encode_overlay(img, "image/webp")
+    with open(overlay_path, "wb") as f:
+        f.write(data)
+    _overlay_cache[job_id] = {"image/webp": (data, etag)}
+    print(f"[VIZ] Overlay WebP saved ({img.size[0]}×{img.size[1]}) → {overlay_path}")
+    return overlay_path
+
+
+def _roads_to_geojson(G, flood_risk=None):
+    """
+    Convert networkx road graph to GeoJSON FeatureCollection.
+    flood_risk: optional per-edge risk array (G.edges() order) used
+    instead of the edges' flood_risk attributes.
+    """
+    from src.road_network import coord_arrays
+
+    # Node coordinates as flat arrays, gathered per edge by dense index
+    coords = coord_arrays(G)
+    xs, ys, iu, iv = coords["lon"], coords["lat"], coords["u"], coords["v"]
+    if flood_risk is None:
+        flood_risk = np.fromiter(
+            (r for _, _, r in G.edges(data="flood_risk", default=0.0)),
+            dtype=np.float64, count=len(iu),
+        )
+    risks = np.asarray(flood_risk, dtype=np.float64).round(3)
+
+    # (E, 2, 2): per edge [[xu, yu], [xv, yv]]
+    coords = np.stack([
+        np.stack([xs[iu], ys[iu]], axis=-1),
+        np.stack([xs[iv], ys[iv]], axis=-1),
+    ], axis=1)
+
+    features = [
+        {
             "type": "Feature",
-            "geometry": {
-                "type": "LineString",
-                "coordinates": [
-                    [G.nodes[u]["x"], G.nodes[u]["y"]],
-                    [G.nodes[v]["x"], G.nodes[v]["y"]],
-                ],
-            },
-            "properties": {"risk": round(risk, 3)},
+            "geometry": {"type": "LineString", "coordinates": c},
+            "properties": {"risk": r},
         }
-        features.append(feat)
+        for c, r in zip(coords.tolist(), risks.tolist())
+    ]
     return {"type": "FeatureCollection", "features": features}
 
 
@@ -503,14 +780,18 @@ def _fetch_buildings(bounds):
     Returns list of {lat, lon, type, floors, name}.
     """
     south, west, north, east = bounds[1], bounds[0], bounds[3], bounds[2]
-    query = f'[out:json][timeout:15];(way["building"]({south},{west},{north},{east}););out center qt 150;'
+    query = _OVERPASS_BUILDINGS_QUERY.format(south=south, west=west, north=north, east=east)
     try:
-        resp = http_requests.get(
-            f'https://overpass-api.de/api/interpreter?data={query}',
+        # POST keeps large bbox queries out of the URL; gzip is requested
+        # by default and decoded transparently
+        resp = _http.post(
+            _OVERPASS_URL,
+            data={'data': query},
+            headers={'Accept-Encoding': 'gzip'},
             timeout=20,
         )
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
     except Exception as e:
         print(f"[BLDG] Overpass query failed: {e}")
         return []
@@ -550,39 +831,43 @@ def _fetch_buildings(bounds):
     return buildings
 
 
-def _compute_impact_stats(buildings, risk_tif_path):
-    """Cross-reference buildings with FSI raster to compute impact stats."""
-    import rasterio
-
-    if not buildings or not os.path.exists(risk_tif_path):
+def _compute_impact_stats(buildings, risk_tif_path, band=None, transform=None):
+    """
+    Cross-reference buildings with FSI raster to compute impact stats.
+    An in-memory FSI grid (band + transform) skips the GeoTIFF read.
+    """
+    if not buildings or (band is None and not os.path.exists(risk_tif_path)):
         return {'total_buildings': len(buildings), 'at_risk': 0, 'high_risk': 0,
                 'population_at_risk': 0, 'critical_facilities': 0}
 
-    with rasterio.open(risk_tif_path) as src:
-        transform = src.transform
-        band = src.read(1)
-        rows, cols = band.shape
-
-    at_risk = 0
-    high_risk = 0
-    pop_at_risk = 0
-    critical = 0
-
-    for b in buildings:
-        col_idx, row_idx = ~transform * (b['lon'], b['lat'])
-        row_idx, col_idx = int(round(row_idx)), int(round(col_idx))
-        if 0 <= row_idx < rows and 0 <= col_idx < cols:
-            fsi = float(band[row_idx, col_idx])
-        else:
-            fsi = 0.0
-        b['fsi'] = round(fsi, 3)
-        if fsi >= 0.33:
-            at_risk += 1
-            pop_at_risk += b.get('pop', 0)
-            if fsi >= 0.66:
-                high_risk += 1
-        if b['type'] in ('hospital', 'school') and fsi >= 0.33:
-            critical += 1
+    if band is None:
+        with rasterio.open(risk_tif_path) as src:
+            transform = src.transform
+            band = src.read(1)
+    rows, cols = band.shape
+
+    # Inverse affine applied to all buildings at once, then one gather
+    n = len(buildings)
+    lons = np.fromiter((b['lon'] for b in buildings), dtype=np.float64, count=n)
+    lats = np.fromiter((b['lat'] for b in buildings), dtype=np.float64, count=n)
+    ia, ib, ic, id_, ie, if_ = (~transform)[:6]
+    col_idx = np.rint(ia * lons + ib * lats + ic).astype(np.int64)
+    row_idx = np.rint(id_ * lons + ie * lats + if_).astype(np.int64)
+    inside = (row_idx >= 0) & (row_idx < rows) & (col_idx >= 0) & (col_idx < cols)
+
+    fsi = np.zeros(n, dtype=np.float64)
+    fsi[inside] = band[row_idx[inside], col_idx[inside]]
+    for b, v in zip(buildings, fsi.tolist()):
+        b['fsi'] = round(v, 3)
+
+    risky = fsi >= 0.33
+    critical_type = np.fromiter(
+        (b['type'] in ('hospital', 'school') for b in buildings), dtype=bool, count=n,
+    )
+    at_risk = int(risky.sum())
+    high_risk = int((fsi >= 0.66).sum())
+    pop_at_risk = sum(b.get('pop', 0) for b, r in zip(buildings, risky.tolist()) if r)
+    critical = int((risky & critical_type).sum())
 
     return {
         'total_buildings': len(buildings),
@@ -603,7 +888,37 @@ def _route_to_geojson(route_coords):
     }
 
 
+def prewarm():
+    """
+    Pay cold-start costs at server start instead of on the first job:
+    the src pipeline modules, GEE auth, AHP weights and the numba
+    kernels (overlay, flow accumulation).
+    """
+    from src.ahp import get_validated_weights
+    import src.gee_data, src.preprocessing, src.hydrology, src.flood_model  # noqa: F401
+    import src.road_network, src.evacuation, src.decision_support  # noqa: F401
+    import scipy.ndimage  # noqa: F401
+
+    try:
+        _ensure_gee()
+    except Exception as e:
+        print(f"[APP] GEE pre-init failed, will retry on first job: {e}")
+    get_validated_weights()
+
+    # Compiles (or loads from the numba cache) the overlay kernel
+    z = np.zeros((2, 2), dtype=np.float32)
+    _fuse_upsample_colorize_hillshade(
+        z, z, _CMAP_LUT, 0.0, 1.0, True, 0.65, 0.65, np.empty((4, 4, 4), dtype=np.uint8),
+    )
+    offsets = src.hydrology._D8_OFFSETS
+    flow_dir = src.hydrology._d8_flow_dir(z, offsets)
+    src.hydrology._accumulate_downstream(flow_dir, offsets, np.ones((2, 2), dtype=np.float32))
+    src.hydrology._accumulate_tiled(flow_dir, offsets, np.ones((2, 2), dtype=np.float32), 1)
+    print("[APP] Pre-warm complete")
+
+
 if __name__ == "__main__":
     print("🌊 Flood Susceptibility GUI starting...")
+    prewarm()
     print("   Open http://localhost:5050 in your browser")
     app.run(debug=False, port=5050, threaded=True)
@@ -10,6 +10,15 @@ Weights derived via AHP in src/ahp.py (CR = 0.006).
 
 # ── Google Earth Engine ──────────────────────────────────────────────────────
 GEE_PROJECT_ID = "gisproj-487215"
+# High-volume endpoint: meant for many concurrent automated requests
+# (parallel tile downloads, overlapping web jobs); None = standard endpoint
+GEE_API_URL = "https://earthengine-highvolume.googleapis.com"
+# GCS bucket (readable by Earth Engine) for uploading local rasters as COGs;
+# None = fall back to embedding the array in the request
+GEE_CACHE_BUCKET = None
+# Earth Engine asset folder (must exist) for pre-built validation layers,
+# e.g. "projects/<project>/assets/flood_cache"; None = always recompute
+GEE_ASSET_ROOT = None
 
 # ── Default Area of Interest (Hyderabad, India) ─────────────────────────────
 DEFAULT_LAT = 17.3850
@@ -26,17 +35,20 @@ SOIL_BAND = "b0"
 EXPORT_SCALE = 250       # metres – match soil resolution
 CRS = "EPSG:4326"
 MAX_PIXELS = 1e9
+TILE_SCALE = 4           # reduceRegion tileScale – smaller server tiles, avoids memory errors on large AOIs
+LOCAL_FSI = True         # FSI in NumPy on a local grid (False = legacy server-side EE path)
+GEE_TILE_PIXELS = 256   # max grid side per GEE download; larger grids fetched as parallel tiles
 
 # ── MCDA Weights (AHP-derived, 5 spatial factors, CR = 0.006) ───────────────
 # Source: Saaty 5×5 pairwise comparison → eigenvector normalisation.
 # Rainfall is NOT a factor — it is applied as a multiplier in Step 2.
 # See src/ahp.py for full matrix and consistency check.
 WEIGHTS = {
-    "elevation":  0.2319,
-    "slope":      0.0906,
-    "soil":       0.0906,
-    "river":      0.3912,
-    "flow_accum": 0.1956,
+    "elevation":  0.2318,
+    "slope":      0.0903,
+    "soil":       0.0903,
+    "river":      0.3918,
+    "flow_accum": 0.1959,
 }
 
 # ── Rainfall Multiplier ─────────────────────────────────────────────────────
@@ -62,3 +74,6 @@ OUTPUT_DIR = "output"
 RISK_GEOTIFF = "flood_risk.tif"
 RISK_MAP_HTML = "flood_risk_map.html"
 REPORT_JSON = "situation_report.json"
+MAX_JOBS = 128       # finished jobs kept in memory (least recently used evicted)
+CACHE_DIR = "cache"               # on-disk cache (pickled OSM road graphs)
+ROAD_CACHE_TTL_S = 7 * 24 * 3600  # re-download road graphs older than this
@@ -7,14 +7,14 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 import config
 from src.gee_data import initialize_ee, create_aoi, fetch_dem, compute_slope, fetch_soil, ee_image_to_numpy
-from src.preprocessing import normalize_elevation, normalize_slope, compute_soil_index
+from src.preprocessing import normalize_elevation, normalize_slope, compute_soil_index, terrain_min_max
 from src.hydrology import (
     fetch_water_features, compute_river_proximity,
     compute_flow_accumulation, normalize_flow_accumulation,
     numpy_to_ee_image,
 )
 from src.ahp import get_validated_weights
-from src.flood_model import compute_base_risk, apply_rainfall_multiplier, apply_water_mask, classify_risk
+from src.flood_model import compute_base_risk, compute_fsi, classify_risk
 import ee
 
 print("=" * 60)
@@ -25,29 +25,26 @@ print("=" * 60)
 
 initialize_ee()
 lat, lon, radius_km = 17.385, 78.487, 5
-aoi = create_aoi(lat, lon, radius_km)
+aoi, bounds = create_aoi(lat, lon, radius_km, with_bounds=True)
 ahp_weights = get_validated_weights()
 
 # Terrain
 dem = fetch_dem(aoi)
 slope = compute_slope(dem)
 clay, sand = fetch_soil(aoi)
-elev_factor = normalize_elevation(dem, aoi)
-slope_factor = normalize_slope(slope, aoi)
+terrain_stats = terrain_min_max(dem, slope, aoi)
+elev_factor = normalize_elevation(dem, aoi, terrain_stats)
+slope_factor = normalize_slope(slope, aoi, terrain_stats)
 soil_factor = compute_soil_index(clay, sand)
 
 # Hydrology
 water_gdf = fetch_water_features(lat, lon, radius_km * 1000)
-aoi_bounds_info = aoi.bounds().getInfo()["coordinates"][0]
-lons = [p[0] for p in aoi_bounds_info]
-lats = [p[1] for p in aoi_bounds_info]
-bounds = (min(lons), min(lats), max(lons), max(lats))
 
 river_array, water_mask_np, river_meta = compute_river_proximity(water_gdf, bounds)
 river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
-water_mask_ee = numpy_to_ee_image(water_mask_np.astype(float), bounds, "water_mask")
+water_mask_ee = numpy_to_ee_image(water_mask_np, bounds, "water_mask")
 
-dem_np = ee_image_to_numpy(dem, aoi)
+dem_np = ee_image_to_numpy(dem, aoi, bounds=bounds)
 flow_accum_raw = compute_flow_accumulation(dem_np)
 flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
 flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
@@ -62,7 +59,7 @@ base_risk = compute_base_risk(
 
 br_stats = base_risk.reduceRegion(
     reducer=ee.Reducer.minMax().combine(ee.Reducer.mean(), sharedInputs=True),
-    geometry=aoi, scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
+    geometry=aoi, scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS, tileScale=config.TILE_SCALE,
 ).getInfo()
 print(f"\nBaseRisk: {br_stats}")
 
@@ -73,29 +70,27 @@ for rain_mm in [10, 150]:
     print(f"  Rain = {rain_mm}mm  |  RainFactor = {rf:.4f}")
     print(f"{'='*50}")
 
-    fsi = apply_rainfall_multiplier(base_risk, rain_mm)
-    fsi = apply_water_mask(fsi, water_mask_ee, rain_mm)
+    fsi = compute_fsi(base_risk, water_mask_ee, rain_mm)
 
     fsi_stats = fsi.reduceRegion(
         reducer=ee.Reducer.minMax().combine(ee.Reducer.mean(), sharedInputs=True),
-        geometry=aoi, scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
+        geometry=aoi, scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS, tileScale=config.TILE_SCALE,
     ).getInfo()
     print(f"  FSI: {fsi_stats}")
 
     risk_class = classify_risk(fsi)
 
-    total_pixels = risk_class.gte(0).reduceRegion(
-        reducer=ee.Reducer.sum(), geometry=aoi,
-        scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
-    )
-    t = ee.Number(total_pixels.values().get(0)).getInfo()
+    # All class counts from one frequencyHistogram pass. Every AOI pixel
+    # gets class 1–3, so the histogram total is the denominator.
+    hist = risk_class.reduceRegion(
+        reducer=ee.Reducer.frequencyHistogram(), geometry=aoi,
+        scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS, tileScale=config.TILE_SCALE,
+    ).getInfo()
+    h = next(iter(hist.values()), None) or {}
+    t = sum(h.values())
 
     for cls_val, cls_name in [(1, "Low"), (2, "Medium"), (3, "High")]:
-        count = risk_class.eq(cls_val).reduceRegion(
-            reducer=ee.Reducer.sum(), geometry=aoi,
-            scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
-        )
-        c = ee.Number(count.values().get(0)).getInfo()
+        c = h.get(str(cls_val), 0)
         pct = (c / t * 100) if t > 0 else 0
         print(f"  {cls_name:8s}: {pct:5.1f}%")
 
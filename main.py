@@ -11,7 +11,7 @@ The pipeline:
     3. Fetch water features, compute river proximity & flow accumulation
     4. Compute 6-factor MCDA flood risk → export GeoTIFF
     5. Load OSM road network → overlay risk
-    6. Find shelters → compute A* safe route
+    6. Compute A* escape route to the nearest safe zone
     7. Generate interactive Folium map
     8. Print situation report
 """
@@ -19,18 +19,26 @@ The pipeline:
 import argparse
 import sys
 import os
-import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 # Ensure project root is on the path so `import config` works
 sys.path.insert(0, os.path.dirname(__file__))
 
 import config
-from src.gee_data import initialize_ee, create_aoi, fetch_dem, compute_slope, fetch_soil
+import ee
+from src.gee_data import (
+    initialize_ee, create_aoi, fetch_dem, compute_slope, fetch_soil,
+    ee_image_to_numpy, ee_image_to_grid, aoi_pixel_mask,
+)
 from src.preprocessing import (
     normalize_elevation,
     normalize_slope,
+    terrain_min_max,
     compute_soil_index,
     validate_range,
+    validate_range_np,
 )
 from src.hydrology import (
     fetch_water_features,
@@ -43,9 +51,13 @@ from src.ahp import get_validated_weights
 from src.flood_model import (
     compute_base_risk, apply_rainfall_multiplier, apply_water_mask,
     classify_risk, export_geotiff,
+    compute_base_risk_np, apply_rainfall_multiplier_np, apply_water_mask_np,
+    classify_risk_np, write_geotiff,
 )
-from src.road_network import load_road_network, sample_risk_on_edges, penalize_flooded_edges
-from src.evacuation import find_shelters, find_best_route
+from src.road_network import (
+    load_road_network, sample_risk_on_edges, label_safe_nodes, edge_arrays, penalized_lengths,
+)
+from src.evacuation import find_escape_route
 from src.visualization import create_risk_map
 from src.decision_support import compute_risk_statistics, count_affected_roads, generate_report
 
@@ -78,6 +90,9 @@ def main():
     print(f"  Rainfall scenario: {args.rainfall} mm")
     print("=" * 60)
 
+    # Background I/O (secondary exports, map HTML)
+    pool = ThreadPoolExecutor(max_workers=2)
+
     # ── Phase 0: AHP Weight Derivation ──────────────────────────────────
     print("\n▶ Phase 0 – AHP Weight Derivation")
     ahp_weights = get_validated_weights()
@@ -85,7 +100,7 @@ def main():
     # ── Phase 1: GEE Setup ──────────────────────────────────────────────
     print("\n▶ Phase 1 – GEE Initialisation")
     initialize_ee()
-    aoi = create_aoi(args.lat, args.lon, args.radius)
+    aoi, bounds = create_aoi(args.lat, args.lon, args.radius, with_bounds=True)
 
     # ── Phase 2: Data Fetch + Terrain Preprocessing ─────────────────────
     print("\n▶ Phase 2 – Terrain Data & Preprocessing")
@@ -93,67 +108,113 @@ def main():
     slope = compute_slope(dem)
     clay, sand = fetch_soil(aoi)
 
-    elev_factor = normalize_elevation(dem, aoi)
-    slope_factor = normalize_slope(slope, aoi)
+    terrain_stats = terrain_min_max(dem, slope, aoi)
+    elev_factor = normalize_elevation(dem, aoi, terrain_stats)
+    slope_factor = normalize_slope(slope, aoi, terrain_stats)
     soil_factor = compute_soil_index(clay, sand)
 
-    # Validate each factor (Step A of debugging checklist)
-    print("\n▶ Factor Validation (Step A)")
-    validate_range(elev_factor, aoi, "elevation_factor")
-    validate_range(slope_factor, aoi, "slope_factor")
-    validate_range(soil_factor, aoi, "soil_factor")
-
     # ── Phase 3: Hydrology ──────────────────────────────────────────
     print("\n▶ Phase 3 – Hydrological Features")
 
     # 3A: River proximity + water mask
     water_gdf = fetch_water_features(args.lat, args.lon, args.radius * 1000)
 
-    # Get AOI bounds for rasterization
-    aoi_bounds_info = aoi.bounds().getInfo()["coordinates"][0]
-    lons = [p[0] for p in aoi_bounds_info]
-    lats = [p[1] for p in aoi_bounds_info]
-    bounds = (min(lons), min(lats), max(lons), max(lats))
-
     river_array, water_mask_np, river_meta = compute_river_proximity(water_gdf, bounds)
-    river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
-    water_mask_ee = numpy_to_ee_image(water_mask_np.astype(float), bounds, "water_mask")
-
-    # 3B: Flow accumulation from DEM
-    from src.gee_data import ee_image_to_numpy
-    dem_np = ee_image_to_numpy(dem, aoi)
-    flow_accum_raw = compute_flow_accumulation(dem_np)
-    flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
-    flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
-
-    # Validate hydrology factors
-    validate_range(river_factor_ee, aoi, "river_factor")
-    validate_range(flow_accum_ee, aoi, "flow_accum_factor")
-
-    # ── Phase 4: Flood Risk Model (BaseRisk × RainFactor) ──────────────
-    print("\n▶ Phase 4 – Flood Risk Model (BaseRisk × RainFactor)")
-
-    # Step 1: Compute 5-factor base susceptibility (no rainfall)
-    base_risk = compute_base_risk(
-        elev_factor, slope_factor, soil_factor,
-        river_factor=river_factor_ee,
-        flow_accum_factor=flow_accum_ee,
-        weights=ahp_weights,
-    )
-    validate_range(base_risk, aoi, "base_risk (before rain)")
 
-    # Step 2: Apply rainfall multiplier
-    fsi = apply_rainfall_multiplier(base_risk, args.rainfall)
-    validate_range(fsi, aoi, f"FSI (rain={args.rainfall}mm)")
-
-    # Step 3: Conditional water body forcing
-    fsi = apply_water_mask(fsi, water_mask_ee, args.rainfall)
-
-    # Adaptive classification (thresholds relative to MaxFSI)
-    risk_classified = classify_risk(fsi)
-
-    risk_tif = export_geotiff(fsi, aoi, config.RISK_GEOTIFF)
-    export_geotiff(risk_classified, aoi, "flood_risk_classified.tif")
+    if config.LOCAL_FSI:
+        # All factors downloaded once onto the river grid; the rest of the
+        # model runs in NumPy (no numpy → EE uploads, no EE exports)
+        grid_transform = river_meta["transform"]
+        grid_shape = (river_meta["height"], river_meta["width"])
+        stack = ee_image_to_grid(
+            ee.Image.cat([dem, elev_factor, slope_factor, soil_factor]),
+            aoi, grid_transform, grid_shape,
+        )
+        stack[:, ~aoi_pixel_mask(args.lat, args.lon, args.radius, grid_transform, grid_shape)] = np.nan
+        dem_grid, elev_np, slope_np, soil_np = stack
+
+        print("\n▶ Factor Validation (Step A)")
+        validate_range_np(elev_np, "elevation_factor")
+        validate_range_np(slope_np, "slope_factor")
+        validate_range_np(soil_np, "soil_factor")
+
+        # 3B: Flow accumulation from DEM (outside the AOI = flat rim at max
+        # elevation, so nothing drains out)
+        dem_filled = np.where(np.isnan(dem_grid), np.nanmax(dem_grid), dem_grid)
+        flow_accum_raw = compute_flow_accumulation(dem_filled)
+        flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
+
+        validate_range_np(river_array, "river_factor")
+        validate_range_np(flow_accum_norm, "flow_accum_factor")
+
+        # ── Phase 4: Flood Risk Model (BaseRisk × RainFactor) ──────────
+        print("\n▶ Phase 4 – Flood Risk Model (BaseRisk × RainFactor)")
+        base_risk = compute_base_risk_np(
+            elev_np, slope_np, soil_np,
+            river_factor=river_array,
+            flow_accum_factor=flow_accum_norm,
+            weights=ahp_weights,
+        )
+        validate_range_np(base_risk, "base_risk (before rain)")
+
+        fsi = apply_rainfall_multiplier_np(base_risk, args.rainfall)
+        validate_range_np(fsi, f"FSI (rain={args.rainfall}mm)")
+        fsi = apply_water_mask_np(fsi, water_mask_np, args.rainfall)
+        risk_classified = classify_risk_np(fsi)
+
+        # Classified export is unused downstream – written in the background
+        classified_future = pool.submit(
+            write_geotiff, risk_classified, grid_transform,
+            "flood_risk_classified.tif", nodata=0,
+        )
+        risk_tif = write_geotiff(fsi, grid_transform, config.RISK_GEOTIFF)
+    else:
+        # Validate each factor (Step A of debugging checklist)
+        print("\n▶ Factor Validation (Step A)")
+        validate_range(elev_factor, aoi, "elevation_factor")
+        validate_range(slope_factor, aoi, "slope_factor")
+        validate_range(soil_factor, aoi, "soil_factor")
+
+        river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
+        water_mask_ee = numpy_to_ee_image(water_mask_np, bounds, "water_mask")
+
+        # 3B: Flow accumulation from DEM
+        dem_np = ee_image_to_numpy(dem, aoi, bounds=bounds)
+        flow_accum_raw = compute_flow_accumulation(dem_np)
+        flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
+        flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
+
+        # Validate hydrology factors
+        validate_range(river_factor_ee, aoi, "river_factor")
+        validate_range(flow_accum_ee, aoi, "flow_accum_factor")
+
+        # ── Phase 4: Flood Risk Model (BaseRisk × RainFactor) ──────────
+        print("\n▶ Phase 4 – Flood Risk Model (BaseRisk × RainFactor)")
+
+        # Step 1: Compute 5-factor base susceptibility (no rainfall)
+        base_risk = compute_base_risk(
+            elev_factor, slope_factor, soil_factor,
+            river_factor=river_factor_ee,
+            flow_accum_factor=flow_accum_ee,
+            weights=ahp_weights,
+        )
+        validate_range(base_risk, aoi, "base_risk (before rain)")
+
+        # Step 2: Apply rainfall multiplier
+        fsi = apply_rainfall_multiplier(base_risk, args.rainfall)
+        validate_range(fsi, aoi, f"FSI (rain={args.rainfall}mm)")
+
+        # Step 3: Conditional water body forcing
+        fsi = apply_water_mask(fsi, water_mask_ee, args.rainfall)
+
+        # Adaptive classification (thresholds relative to MaxFSI)
+        risk_classified = classify_risk(fsi)
+
+        # Both exports wait on GEE – run them side by side
+        classified_future = pool.submit(
+            export_geotiff, risk_classified, aoi, "flood_risk_classified.tif"
+        )
+        risk_tif = export_geotiff(fsi, aoi, config.RISK_GEOTIFF)
 
     # ── Phase 5-6: Roads & Evacuation ───────────────────────────────────
     road_graph = None
@@ -169,25 +230,26 @@ def main():
             road_graph = sample_risk_on_edges(road_graph, risk_tif)
 
             print("\n▶ Phase 6 – Evacuation Routing")
-            shelters = find_shelters(args.lat, args.lon, args.radius * 1000)
-
-            # Penalise after sampling (for routing only, keep original for stats)
-            road_graph_original = copy.deepcopy(road_graph)
-            road_graph_safe = penalize_flooded_edges(copy.deepcopy(road_graph))
-
-            if shelters:
-                evac_route, chosen_shelter = find_best_route(
-                    road_graph_safe, start_lat, start_lon, shelters
-                )
-
-            road_stats = count_affected_roads(road_graph_original)
+            # Flood penalties go in as a per-edge weight array (routing
+            # only), so stats and the map share the one unmodified graph
+            road_graph = label_safe_nodes(road_graph, risk_tif)
+            edges = edge_arrays(road_graph)
+            evac_route, chosen_shelter = find_escape_route(
+                road_graph, start_lat, start_lon,
+                weight=penalized_lengths(edges["length"], edges["flood_risk"]),
+                edges=edges,
+            )
+
+            road_stats = count_affected_roads(road_graph, flood_risk=edges["flood_risk"])
         except Exception as e:
             print(f"[WARN] Road/evacuation analysis failed: {e}")
             print("       Continuing with risk map only...")
 
     # ── Phase 7: Visualization ──────────────────────────────────────────
     print("\n▶ Phase 7 – Visualization")
-    map_path = create_risk_map(
+    # Map HTML and the Phase 8 stats/report are independent – overlap them
+    map_future = pool.submit(
+        create_risk_map,
         center_lat=args.lat,
         center_lon=args.lon,
         risk_tif_path=risk_tif,
@@ -215,6 +277,9 @@ def main():
             "rainfall_mm": args.rainfall,
         },
     )
+    map_path = map_future.result()
+    classified_future.result()
+    pool.shutdown()
 
     print("\n" + "=" * 60)
     print("  ✅  Pipeline complete!")
@@ -0,0 +1,54 @@
+"""
+Pre-build Validation Assets
+===========================
+Exports each validation location's rainfall-independent layers (river
+proximity, water mask, flow accumulation and the static soil index) as
+one Earth Engine asset under config.GEE_ASSET_ROOT.  validate_model.py
+then loads them instead of recomputing flow accumulation, re-uploading
+the rasters and re-deriving the soil index from clay/sand.
+
+Export tasks run asynchronously on EE; check progress in the Tasks tab.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import config
+from src.gee_data import initialize_ee
+from validate_model import LOCATIONS, RADIUS_KM, hydro_asset_id, _prepare_location
+import ee
+
+
+def main():
+    if not config.GEE_ASSET_ROOT:
+        print("[ASSET] Set config.GEE_ASSET_ROOT to an existing asset folder first")
+        return
+
+    initialize_ee()
+
+    for loc in LOCATIONS:
+        lat, lon = loc["lat"], loc["lon"]
+        asset_id = hydro_asset_id(lat, lon, RADIUS_KM)
+        try:
+            ee.data.getAsset(asset_id)
+            print(f"[ASSET] {loc['name']}: exists – {asset_id}")
+            continue
+        except ee.EEException:
+            pass
+
+        aoi, factors, water_mask_ee, _, _ = _prepare_location(lat, lon, RADIUS_KM, use_assets=False)
+        image = ee.Image.cat([factors[3], water_mask_ee, factors[4], factors[2]]).toFloat()
+        task = ee.batch.Export.image.toAsset(
+            image=image,
+            description=asset_id.rsplit("/", 1)[-1],
+            assetId=asset_id,
+            region=aoi,
+            scale=config.EXPORT_SCALE,
+            crs=config.CRS,
+            maxPixels=config.MAX_PIXELS,
+        )
+        task.start()
+        print(f"[ASSET] {loc['name']}: export started → {asset_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ References:
     Saaty, T.L. (1980). The Analytic Hierarchy Process.
 """
 
+from functools import lru_cache
+
 import numpy as np
 
 
@@ -36,11 +38,14 @@ PAIRWISE_MATRIX = np.array([
     [  2,    4,     4,     1,     2    ],   # River
     [  1,    2,     2,     1/2,   1    ],   # Flow Accum
 ], dtype=np.float64)
+PAIRWISE_MATRIX.flags.writeable = False  # shared by the cached default weights
 
 
-def compute_ahp_weights(matrix: np.ndarray = None, names: list = None):
+def compute_ahp_weights(matrix: np.ndarray = None, names: list = None,
+                        verbose: bool = True):
     """
     Compute AHP priority weights from a pairwise comparison matrix.
+    Prints a summary unless verbose=False.
 
     Returns:
         weights: dict {factor_name: weight}
@@ -49,24 +54,21 @@ def compute_ahp_weights(matrix: np.ndarray = None, names: list = None):
         is_consistent: bool (CR < 0.1)
     """
     if matrix is None:
-        matrix = PAIRWISE_MATRIX.copy()
+        matrix = PAIRWISE_MATRIX
     if names is None:
         names = FACTOR_NAMES
 
     n = matrix.shape[0]
     assert matrix.shape == (n, n), "Matrix must be square"
 
-    # ── Step 1: Normalise columns ────────────────────────────────────────
-    col_sums = matrix.sum(axis=0)
-    normalised = matrix / col_sums
-
-    # ── Step 2: Compute priority vector (row averages) ───────────────────
-    priority = normalised.mean(axis=1)
+    # ── Step 1: Principal eigenvector → priority vector ─────────────────
+    eigvals, eigvecs = np.linalg.eig(matrix)
+    k = np.argmax(eigvals.real)
+    priority = np.abs(eigvecs[:, k].real)
+    priority /= priority.sum()
 
-    # ── Step 3: Consistency check ────────────────────────────────────────
-    weighted = matrix @ priority
-    lambda_ratios = weighted / priority
-    lambda_max = lambda_ratios.mean()
+    # ── Step 2: Consistency check (exact λ_max) ──────────────────────────
+    lambda_max = eigvals[k].real
 
     ci = (lambda_max - n) / (n - 1)
 
@@ -78,6 +80,9 @@ def compute_ahp_weights(matrix: np.ndarray = None, names: list = None):
     # Build weights dict
     weights = {name: round(float(w), 4) for name, w in zip(names, priority)}
 
+    if not verbose:
+        return weights, ci, cr, is_consistent
+
     # Print summary
     print(f"[AHP] Pairwise matrix ({n}×{n}) – 5 spatial factors")
     for name, w in weights.items():
@@ -89,12 +94,18 @@ def compute_ahp_weights(matrix: np.ndarray = None, names: list = None):
     return weights, ci, cr, is_consistent
 
 
+@lru_cache(maxsize=1)
+def _cached_default_weights():
+    """Default-matrix AHP result; computed (and printed) once per process."""
+    return compute_ahp_weights(PAIRWISE_MATRIX, tuple(FACTOR_NAMES))
+
+
 def get_validated_weights():
     """
     Compute and validate AHP weights.
     Raises ValueError if the matrix is inconsistent (CR >= 0.1).
     """
-    weights, ci, cr, ok = compute_ahp_weights()
+    weights, ci, cr, ok = _cached_default_weights()
     if not ok:
         raise ValueError(
             f"AHP pairwise matrix is inconsistent (CR={cr:.4f} >= 0.1). "
@@ -6,37 +6,84 @@ import os
 import json
 import numpy as np
 import rasterio
+from concurrent.futures import ThreadPoolExecutor
+from pyproj import Geod
 
 import config
 
 
+_STATS_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _block_partials(risk_tif_path: str, windows) -> tuple:
+    """(count, low, high, sum, max) over the given block windows."""
+    t = config.RISK_THRESHOLDS
+    total = low = high = 0
+    risk_sum, risk_max = 0.0, -np.inf
+    # Own handle per worker – rasterio datasets are not thread-safe
+    with rasterio.open(risk_tif_path) as src:
+        for window in windows:
+            tile = src.read(1, window=window)
+            valid = tile[~np.isnan(tile)]
+            if valid.size == 0:
+                continue
+            total += valid.size
+            low += int(np.count_nonzero(valid <= t["low_max"]))
+            high += int(np.count_nonzero(valid > t["medium_max"]))
+            risk_sum += float(valid.sum(dtype=np.float64))
+            risk_max = max(risk_max, float(valid.max()))
+    return total, low, high, risk_sum, risk_max
+
+
+def _pixel_area_m2(src) -> float:
+    """
+    Area of one pixel in m².  Projected CRS: straight from the transform.
+    Geographic CRS: geodesic (WGS84) area of a pixel at the raster's mid
+    latitude.
+    """
+    t = src.transform
+    if src.crs is not None and src.crs.is_projected:
+        return abs(t.a * t.e) * src.crs.linear_units_factor[1] ** 2
+
+    bounds = src.bounds
+    mid_lat = (bounds.bottom + bounds.top) / 2
+    lon0, dlon, dlat = bounds.left, abs(t.a), abs(t.e)
+    lons = [lon0, lon0 + dlon, lon0 + dlon, lon0]
+    lats = [mid_lat - dlat / 2, mid_lat - dlat / 2, mid_lat + dlat / 2, mid_lat + dlat / 2]
+    area, _ = Geod(ellps="WGS84").polygon_area_perimeter(lons, lats)
+    return abs(area)
+
+
 def compute_risk_statistics(risk_tif_path: str) -> dict:
     """
     Compute area percentages per risk class from the GeoTIFF.
     Returns dict with pixel counts and percentages.
     """
     with rasterio.open(risk_tif_path) as src:
-        band = src.read(1)
-        bounds = src.bounds
-        # For EPSG:4326, pixel size is in degrees – convert to metres
-        import math
-        mid_lat = (bounds.bottom + bounds.top) / 2
-        deg_to_m_lat = 111_320  # metres per degree latitude
-        deg_to_m_lon = 111_320 * math.cos(math.radians(mid_lat))
-        pixel_w_m = abs(src.transform.a) * deg_to_m_lon
-        pixel_h_m = abs(src.transform.e) * deg_to_m_lat
-        pixel_area_m2 = pixel_w_m * pixel_h_m
-
-    valid = band[~np.isnan(band)]
-    total = len(valid)
+        pixel_area_m2 = _pixel_area_m2(src)
+        windows = [w for _, w in src.block_windows(1)]
+
+    # Stream the band block by block (peak memory is one tile per worker);
+    # large rasters split their blocks across threads – GDAL decode and the
+    # NumPy reductions release the GIL
+    n_workers = max(1, min(_STATS_WORKERS, len(windows) // 16))
+    if n_workers == 1:
+        parts = [_block_partials(risk_tif_path, windows)]
+    else:
+        groups = [windows[i::n_workers] for i in range(n_workers)]
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            parts = list(pool.map(lambda g: _block_partials(risk_tif_path, g), groups))
+
+    total = sum(p[0] for p in parts)
+    low = sum(p[1] for p in parts)
+    high = sum(p[2] for p in parts)
+    medium = total - low - high
+    risk_sum = sum(p[3] for p in parts)
+    risk_max = max(p[4] for p in parts)
+
     if total == 0:
         return {"error": "No valid pixels"}
 
-    t = config.RISK_THRESHOLDS
-    low = np.sum(valid <= t["low_max"])
-    medium = np.sum((valid > t["low_max"]) & (valid <= t["medium_max"]))
-    high = np.sum(valid > t["medium_max"])
-
     def _class_stats(count):
         return {
             "pixels": int(count),
@@ -51,8 +98,8 @@ def compute_risk_statistics(risk_tif_path: str) -> dict:
         "low_risk": _class_stats(low),
         "medium_risk": _class_stats(medium),
         "high_risk": _class_stats(high),
-        "mean_risk": round(float(np.nanmean(valid)), 4),
-        "max_risk": round(float(np.nanmax(valid)), 4),
+        "mean_risk": round(risk_sum / total, 4),
+        "max_risk": round(risk_max, 4),
     }
     print(f"[DSS] Risk stats – Low: {stats['low_risk']['pct']}%, "
           f"Medium: {stats['medium_risk']['pct']}%, "
@@ -60,14 +107,25 @@ def compute_risk_statistics(risk_tif_path: str) -> dict:
     return stats
 
 
-def count_affected_roads(G) -> dict:
-    """Count roads by risk category (3 classes)."""
+def count_affected_roads(G, flood_risk: np.ndarray = None) -> dict:
+    """
+    Count roads by risk category (3 classes).
+    flood_risk: optional per-edge column (road_network.edge_arrays) to
+    skip walking the edge dicts.
+    """
     t = config.RISK_THRESHOLDS
     total = G.number_of_edges()
-    high = sum(1 for _, _, d in G.edges(data=True)
-               if d.get("flood_risk", 0) > t["medium_max"])
-    medium = sum(1 for _, _, d in G.edges(data=True)
-                 if t["low_max"] < d.get("flood_risk", 0) <= t["medium_max"])
+    # One pass over the edges, then vector comparisons (float64 so the
+    # threshold comparisons match the scalar ones exactly)
+    if flood_risk is not None:
+        risks = np.asarray(flood_risk, dtype=np.float64)
+    else:
+        risks = np.fromiter(
+            (r for _, _, r in G.edges(data="flood_risk", default=0)),
+            dtype=np.float64, count=total,
+        )
+    high = int((risks > t["medium_max"]).sum())
+    medium = int(((risks > t["low_max"]) & (risks <= t["medium_max"])).sum())
     safe = total - high - medium
     return {
         "total_segments": total,
@@ -8,32 +8,210 @@ This is physically correct: escape the flood boundary, don't search
 for a specific building.
 """
 
-import math
-import heapq
+import numpy as np
 import osmnx as ox
 import networkx as nx
+from numba import njit
+from scipy.spatial import cKDTree
+
+from src.road_network import coord_arrays, edge_arrays
 
 
 def _haversine_m(lat1, lon1, lat2, lon2):
-    """Haversine distance in metres."""
+    """Haversine distance in metres (element-wise over arrays)."""
     R = 6_371_000
-    rlat1, rlat2 = math.radians(lat1), math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon / 2) ** 2
-    return 2 * R * math.asin(math.sqrt(a))
+    rlat1, rlat2 = np.radians(lat1), np.radians(lat2)
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(rlat1) * np.cos(rlat2) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
+
+
+def _graph_to_csr(G, weight, edges, is_safe=None):
+    """
+    CSR adjacency over dense node indices with per-edge costs.
+
+    The topology (indptr, indices) is the one cached on the graph by
+    road_network.coord_arrays(), so only the weight column is built per
+    call.  edges is road_network.edge_arrays(G); weight is a per-edge
+    array in the same order or a callable on the edge dict (evaluated
+    eagerly, once per edge, before the search).  Impassable edges (NaN or
+    None) cost +inf, which the search never relaxes.
+    is_safe defaults to the nodes' is_safe attributes.
+    Returns (nodes, indptr, indices, w, lat, lon, is_safe).
+    """
+    nodes = edges["nodes"]
+    n = len(nodes)
+
+    if callable(weight):
+        w = np.fromiter(
+            (np.inf if c is None else c for c in (weight(d) for _, _, d in G.edges(data=True))),
+            dtype=np.float64, count=len(edges["u"]),
+        )
+    else:
+        w = np.asarray(weight, dtype=np.float64)
+        w = np.where(np.isnan(w), np.inf, w)
+
+    coords = coord_arrays(G)
+    indptr, indices = coords["indptr"], coords["v"]
+    lat, lon = coords["lat"], coords["lon"]
+    if is_safe is None:
+        is_safe = np.fromiter(
+            (bool(d.get("is_safe", False)) for _, d in G.nodes(data=True)),
+            dtype=np.bool_, count=n,
+        )
+    else:
+        is_safe = np.asarray(is_safe, dtype=np.bool_)
+    return nodes, indptr, indices, w, lat, lon, is_safe
+
+
+def _safe_zone_heuristic(lat, lon, is_safe):
+    """
+    A* heuristic for every node at once: haversine to the nearest safe
+    node.  The nearest node comes from a KD-tree on unit-sphere xyz –
+    chord length is monotonic in great-circle distance, so this is the
+    exact min over safe nodes, and the metres are one vectorised pass.
+    """
+    rlat, rlon = np.radians(lat), np.radians(lon)
+    xyz = np.column_stack((
+        np.cos(rlat) * np.cos(rlon), np.cos(rlat) * np.sin(rlon), np.sin(rlat),
+    ))
+    _, nearest = cKDTree(xyz[is_safe]).query(xyz, k=1)
+    safe = np.flatnonzero(is_safe)[nearest]
+    return _haversine_m(lat, lon, lat[safe], lon[safe])
+
+
+@njit(inline="always")
+def _heap_less(fk, gk, a, b):
+    """Lexicographic (f, g, node) order, as heapq compares the tuples."""
+    if fk[a] != fk[b]:
+        return fk[a] < fk[b]
+    if gk[a] != gk[b]:
+        return gk[a] < gk[b]
+    return a < b
+
+
+@njit(inline="always")
+def _sift_up(heap, pos, fk, gk, i):
+    node = heap[i]
+    while i > 0:
+        parent = (i - 1) // 2
+        if not _heap_less(fk, gk, node, heap[parent]):
+            break
+        heap[i] = heap[parent]
+        pos[heap[i]] = i
+        i = parent
+    heap[i] = node
+    pos[node] = i
+
+
+@njit(inline="always")
+def _sift_down(heap, pos, fk, gk, i, size):
+    node = heap[i]
+    while True:
+        c = 2 * i + 1
+        if c >= size:
+            break
+        if c + 1 < size and _heap_less(fk, gk, heap[c + 1], heap[c]):
+            c += 1
+        if not _heap_less(fk, gk, heap[c], node):
+            break
+        heap[i] = heap[c]
+        pos[heap[i]] = i
+        i = c
+    heap[i] = node
+    pos[node] = i
+
+
+@njit(cache=True)
+def _astar_csr(indptr, indices, w, h, is_safe, start):
+    """
+    A* over CSR arrays with early exit at the first safe node popped.
+    h[i] is the precomputed heuristic (see _safe_zone_heuristic).
+
+    The open set is an indexed binary heap with decrease-key, so each node
+    is in it at most once (O(V) entries, no stale pops).  ub is the best
+    g seen so far at a safe node; the heuristic is 0 there, so that node
+    pops before anything with f > ub, and such nodes are never queued.
+
+    Returns (goal, came_from, g_scores); goal is -1 if unreachable.
+    """
+    n = indptr.shape[0] - 1
+    g_scores = np.full(n, np.inf)
+    f_scores = np.full(n, np.inf)
+    came_from = np.full(n, -1, dtype=np.int64)
+    closed = np.zeros(n, dtype=np.bool_)
+
+    heap = np.empty(n, dtype=np.int64)
+    pos = np.full(n, -1, dtype=np.int64)  # index in heap, -1 if not queued
+
+    g_scores[start] = 0.0
+    f_scores[start] = h[start]
+    heap[0] = start
+    pos[start] = 0
+    size = 1
+    ub = np.inf
+
+    while size > 0:
+        # pop
+        current = heap[0]
+        pos[current] = -1
+        size -= 1
+        if size > 0:
+            heap[0] = heap[size]
+            _sift_down(heap, pos, f_scores, g_scores, 0, size)
+        closed[current] = True
+
+        if is_safe[current]:
+            return current, came_from, g_scores
+
+        g = g_scores[current]
+        for e in range(indptr[current], indptr[current + 1]):
+            nb = indices[e]
+            if closed[nb]:
+                continue
+            tentative_g = g + w[e]
+            if tentative_g < g_scores[nb] and tentative_g + h[nb] <= ub:
+                g_scores[nb] = tentative_g
+                f_scores[nb] = tentative_g + h[nb]
+                if is_safe[nb]:
+                    ub = tentative_g
+                came_from[nb] = current
+                i = pos[nb]
+                if i < 0:
+                    # push
+                    i = size
+                    heap[i] = nb
+                    size += 1
+                # decrease-key (keys only ever shrink)
+                _sift_up(heap, pos, f_scores, g_scores, i)
+
+    return -1, came_from, g_scores
 
 
 def find_escape_route(
     G: nx.MultiDiGraph,
     start_lat: float,
     start_lon: float,
+    weight=None,
+    edges: dict = None,
+    fsi: np.ndarray = None,
+    is_safe: np.ndarray = None,
 ) -> tuple[list[tuple[float, float]] | None, dict | None]:
     """
     A* from origin to the NEAREST safe-zone node (is_safe=True).
 
     Uses flood-penalised edge lengths as weights and haversine heuristic
-    toward the nearest safe node.
+    toward the nearest safe node.  Edge cost is weight if given – either a
+    per-edge array aligned with edges (NaN = impassable, e.g.
+    road_network.penalized_lengths()) or a callable on the edge dict
+    (None = impassable; called once per edge up front) – otherwise the
+    edge's "length" attribute.  edges is
+    road_network.edge_arrays(G), computed here if not passed in.
+
+    fsi / is_safe: per-node arrays from road_network.safe_node_arrays(),
+    used instead of the nodes' label_safe_nodes() attributes – lets
+    concurrent jobs route on one shared graph without relabelling it.
 
     Returns:
         (route, safe_node_info)
@@ -42,86 +220,54 @@ def find_escape_route(
     """
     start_node = ox.nearest_nodes(G, start_lon, start_lat)
 
+    if edges is None:
+        edges = edge_arrays(G)
+    if weight is None:
+        weight = edges["length"]
+
+    nodes, indptr, indices, w, lat, lon, is_safe = _graph_to_csr(G, weight, edges, is_safe)
+    if fsi is None:
+        node_fsi = lambda i: G.nodes[nodes[i]].get("fsi", 0)
+    else:
+        node_fsi = lambda i: float(fsi[i])
+    start = nodes.index(start_node)
+
     # Check if origin is already safe
-    if G.nodes[start_node].get("is_safe", False):
+    if is_safe[start]:
         nd = G.nodes[start_node]
-        print(f"[EVAC] Origin is already in safe zone (FSI={nd.get('fsi', 0):.3f})")
-        return [(nd["y"], nd["x"])], {"lat": nd["y"], "lon": nd["x"], "fsi": nd.get("fsi", 0)}
-
-    # Collect all safe-zone nodes for heuristic
-    safe_nodes = [
-        n for n, d in G.nodes(data=True) if d.get("is_safe", False)
-    ]
+        print(f"[EVAC] Origin is already in safe zone (FSI={node_fsi(start):.3f})")
+        return [(nd["y"], nd["x"])], {"lat": nd["y"], "lon": nd["x"], "fsi": node_fsi(start)}
 
-    if not safe_nodes:
+    if not is_safe.any():
         print("[EVAC] No safe-zone nodes found in graph")
         return None, None
 
-    # Pre-compute safe node positions for fast heuristic
-    safe_positions = [
-        (G.nodes[n]["y"], G.nodes[n]["x"]) for n in safe_nodes
-    ]
-    safe_set = set(safe_nodes)
-
-    def heuristic(node):
-        """Minimum haversine distance to any safe node."""
-        nd = G.nodes[node]
-        ny, nx_ = nd["y"], nd["x"]
-        return min(
-            _haversine_m(ny, nx_, sy, sx)
-            for sy, sx in safe_positions
-        )
+    # ── A* with early termination at any safe node (compiled, on CSR) ───
+    goal, came_from, g_scores = _astar_csr(
+        indptr, indices, w, _safe_zone_heuristic(lat, lon, is_safe), is_safe, start,
+    )
 
-    # ── A* with early termination at any safe node ──────────────────────
-    # Standard A* but goal test is: node in safe_set
-    open_set = [(heuristic(start_node), 0, start_node)]  # (f, g, node)
-    g_scores = {start_node: 0}
-    came_from = {}
-    visited = set()
-
-    while open_set:
-        f, g, current = heapq.heappop(open_set)
-
-        if current in visited:
-            continue
-        visited.add(current)
-
-        # Goal: reached a safe zone
-        if current in safe_set:
-            # Reconstruct path
-            path = []
-            node = current
-            while node in came_from:
-                path.append(node)
-                node = came_from[node]
-            path.append(start_node)
-            path.reverse()
-
-            route = [(G.nodes[n]["y"], G.nodes[n]["x"]) for n in path]
-            dest = G.nodes[current]
-            dest_info = {
-                "lat": dest["y"],
-                "lon": dest["x"],
-                "fsi": dest.get("fsi", 0),
-            }
-
-            dist = g_scores[current]
-            print(
-                f"[EVAC] Escape route found – {len(path)} nodes, "
-                f"~{dist:.0f}m to safe zone (FSI={dest.get('fsi', 0):.3f})"
-            )
-            return route, dest_info
-
-        # Expand neighbours
-        for _, neighbour, edge_data in G.edges(current, data=True):
-            if neighbour in visited:
-                continue
-            tentative_g = g + edge_data.get("length", 1)
-            if tentative_g < g_scores.get(neighbour, float("inf")):
-                g_scores[neighbour] = tentative_g
-                came_from[neighbour] = current
-                f_score = tentative_g + heuristic(neighbour)
-                heapq.heappush(open_set, (f_score, tentative_g, neighbour))
+    if goal >= 0:
+        # Reconstruct path
+        path = [goal]
+        while came_from[path[-1]] >= 0:
+            path.append(int(came_from[path[-1]]))
+        path.reverse()
+
+        route = list(zip(lat[path].tolist(), lon[path].tolist()))
+        dest = G.nodes[nodes[goal]]
+        dest_info = {
+            "lat": dest["y"],
+            "lon": dest["x"],
+            "fsi": node_fsi(goal),
+        }
+
+        dist = g_scores[goal]
+        print(
+            f"[EVAC] Escape route found – {len(path)} nodes, "
+            f"~{dist:.0f}m to safe zone (FSI={dest_info['fsi']:.3f})"
+        )
+        return route, dest_info
 
     print("[EVAC] No escape route found – all paths blocked")
     return None, None
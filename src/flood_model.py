@@ -8,10 +8,16 @@ Model:
 
 Classification uses adaptive thresholds relative to the scenario's max risk,
 so the gradient is always visible regardless of rainfall magnitude.
+
+Every step also has a NumPy twin (``*_np``) operating on factor grids that
+were already aligned locally, so the web pipeline can skip the
+numpy → EE upload / EE → GeoTIFF download round-trip.
 """
 
 import os
 import ee
+import numpy as np
+import rasterio
 import config
 
 
@@ -35,22 +41,25 @@ def compute_base_risk(
     """
     w = weights or config.WEIGHTS
 
-    risk = (
-        elevation_factor.multiply(w["elevation"])
-        .add(slope_factor.multiply(w["slope"]))
-        .add(soil_factor.multiply(w["soil"]))
-    )
+    # One server-side expression instead of a chain of multiply/add nodes,
+    # so EE plans the whole weighted sum as a single per-tile evaluation
+    terms = ["elev * w_elev", "slope * w_slope", "soil * w_soil"]
+    inputs = {
+        "elev": elevation_factor, "slope": slope_factor, "soil": soil_factor,
+        "w_elev": w["elevation"], "w_slope": w["slope"], "w_soil": w["soil"],
+    }
 
     if river_factor is not None:
         # Slope-dampened river: strong only where terrain is flat
-        river_effective = river_factor.multiply(slope_factor)
-        risk = risk.add(river_effective.multiply(w["river"]))
+        terms.append("river * slope * w_river")
+        inputs.update(river=river_factor, w_river=w["river"])
         print("[MODEL] River factor dampened by slope (RiverEffective = River × Slope)")
 
     if flow_accum_factor is not None:
-        risk = risk.add(flow_accum_factor.multiply(w["flow_accum"]))
+        terms.append("flow * w_flow")
+        inputs.update(flow=flow_accum_factor, w_flow=w["flow_accum"])
 
-    risk = risk.rename("base_risk")
+    risk = elevation_factor.expression(" + ".join(terms), inputs).rename("base_risk")
 
     print(f"[MODEL] Base susceptibility computed – weights: {w}")
     return risk
@@ -68,6 +77,13 @@ def apply_rainfall_multiplier(
     RainFactor = (Rain / RainMax) ^ alpha
     FSI = clamp(BaseRisk × RainFactor, 0, 1)
     """
+    rain_factor = _rain_factor(rainfall_mm, rain_max, alpha)
+    fsi = base_risk.multiply(rain_factor).min(1.0).max(0.0).rename("flood_risk")
+    return fsi
+
+
+def _rain_factor(rainfall_mm: float, rain_max: float = None, alpha: float = None) -> float:
+    """RainFactor = min(Rain / RainMax, 1) ^ alpha."""
     rain_max = rain_max or config.RAIN_MAX
     alpha = alpha or config.RAIN_ALPHA
 
@@ -75,9 +91,7 @@ def apply_rainfall_multiplier(
     rain_factor = rain_ratio ** alpha
 
     print(f"[MODEL] Rainfall multiplier: ({rainfall_mm}/{rain_max})^{alpha} = {rain_factor:.4f}")
-
-    fsi = base_risk.multiply(rain_factor).min(1.0).max(0.0).rename("flood_risk")
-    return fsi
+    return rain_factor
 
 
 def apply_water_mask(fsi: ee.Image, water_mask: ee.Image, rainfall_mm: float) -> ee.Image:
@@ -95,6 +109,35 @@ def apply_water_mask(fsi: ee.Image, water_mask: ee.Image, rainfall_mm: float) ->
     return forced
 
 
+def compute_fsi(
+    base_risk: ee.Image,
+    water_mask: ee.Image,
+    rainfall_mm: float,
+    rain_max: float = None,
+    alpha: float = None,
+) -> ee.Image:
+    """
+    apply_rainfall_multiplier() followed by apply_water_mask(), fused into
+    one ee.Image.expression.  RainFactor and the water-override decision
+    are resolved in Python and baked in as literals, so the request
+    carries a single expression node instead of the multiply/min/max/where
+    chain.
+    """
+    rain_factor = _rain_factor(rainfall_mm, rain_max, alpha)
+    extreme_threshold = config.RAIN_MAX * 0.3  # 30% of design storm
+
+    expr = f"max(0, min(1, base * {rain_factor:.17f}))"
+    inputs = {"base": base_risk}
+    if rainfall_mm >= extreme_threshold:
+        # unmask: pixels outside the mask footprint keep their FSI, as with .where()
+        expr = f"water > 0 ? 1.0 : {expr}"
+        inputs["water"] = water_mask.unmask(0)
+        print(f"[MODEL] Water bodies forced to FSI=1.0 (rain {rainfall_mm}mm >= {extreme_threshold}mm threshold)")
+    else:
+        print(f"[MODEL] Water bodies NOT forced (rain {rainfall_mm}mm < {extreme_threshold}mm threshold)")
+    return base_risk.expression(expr, inputs).rename("flood_risk")
+
+
 def classify_risk_adaptive(fsi: ee.Image, aoi: ee.Geometry) -> ee.Image:
     """
     Adaptive risk classification based on the scenario's actual FSI range.
@@ -111,6 +154,7 @@ def classify_risk_adaptive(fsi: ee.Image, aoi: ee.Geometry) -> ee.Image:
         geometry=aoi,
         scale=config.EXPORT_SCALE,
         maxPixels=config.MAX_PIXELS,
+        tileScale=config.TILE_SCALE,
     )
     max_fsi = ee.Number(max_fsi_dict.values().get(0))
 
@@ -158,14 +202,36 @@ def export_geotiff(
     scale: int = config.EXPORT_SCALE,
 ) -> str:
     """
-    Export an EE image to a local GeoTIFF via geemap.
+    Export an EE image to a local GeoTIFF.
     Returns the output file path.
-    """
-    import geemap
 
+    Uses geedim when installed (pip install geedim): it splits the
+    request into tiles under the download size cap and fetches them in
+    parallel threads.  Otherwise falls back to geemap's single request.
+    """
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
     out_path = os.path.join(config.OUTPUT_DIR, filename or config.RISK_GEOTIFF)
 
+    try:
+        import geedim
+    except ImportError:
+        geedim = None
+
+    if geedim is not None:
+        geedim.MaskedImage(image, mask=False).download(
+            out_path,
+            overwrite=True,
+            num_threads=8,
+            max_tile_size=32,
+            crs=config.CRS,
+            scale=scale,
+            region=aoi,
+        )
+        print(f"[EXPORT] GeoTIFF saved → {out_path}")
+        return out_path
+
+    import geemap
+
     geemap.ee_export_image(
         image,
         filename=out_path,
@@ -176,3 +242,100 @@ def export_geotiff(
     )
     print(f"[EXPORT] GeoTIFF saved → {out_path}")
     return out_path
+
+
+# ── NumPy path (pre-aligned local grids) ────────────────────────────────────
+
+def compute_base_risk_np(
+    elevation_factor: np.ndarray,
+    slope_factor: np.ndarray,
+    soil_factor: np.ndarray,
+    river_factor: np.ndarray = None,
+    flow_accum_factor: np.ndarray = None,
+    weights: dict = None,
+) -> np.ndarray:
+    """NumPy twin of compute_base_risk() – same formula, same slope-dampened river."""
+    w = weights or config.WEIGHTS
+
+    risk = (
+        w["elevation"] * elevation_factor
+        + w["slope"] * slope_factor
+        + w["soil"] * soil_factor
+    )
+    if river_factor is not None:
+        risk = risk + w["river"] * (river_factor * slope_factor)
+    if flow_accum_factor is not None:
+        risk = risk + w["flow_accum"] * flow_accum_factor
+
+    print(f"[MODEL] Base susceptibility computed locally – weights: {w}")
+    return risk.astype(np.float32)
+
+
+def apply_rainfall_multiplier_np(
+    base_risk: np.ndarray,
+    rainfall_mm: float,
+    rain_max: float = None,
+    alpha: float = None,
+) -> np.ndarray:
+    """NumPy twin of apply_rainfall_multiplier(); NaN (outside AOI) is preserved."""
+    rain_factor = _rain_factor(rainfall_mm, rain_max, alpha)
+    return np.clip(base_risk * rain_factor, 0.0, 1.0)
+
+
+def apply_water_mask_np(fsi: np.ndarray, water_mask: np.ndarray, rainfall_mm: float) -> np.ndarray:
+    """NumPy twin of apply_water_mask()."""
+    extreme_threshold = config.RAIN_MAX * 0.3  # 30% of design storm
+    if rainfall_mm >= extreme_threshold:
+        fsi = np.where((water_mask > 0) & ~np.isnan(fsi), 1.0, fsi).astype(np.float32)
+        print(f"[MODEL] Water bodies forced to FSI=1.0 (rain {rainfall_mm}mm >= {extreme_threshold}mm threshold)")
+    else:
+        print(f"[MODEL] Water bodies NOT forced (rain {rainfall_mm}mm < {extreme_threshold}mm threshold)")
+    return fsi
+
+
+def classify_risk_np(risk: np.ndarray) -> np.ndarray:
+    """NumPy twin of classify_risk(): 1/2/3 classes, 0 = nodata."""
+    t = config.RISK_THRESHOLDS
+    classified = np.ones(risk.shape, dtype=np.uint8)
+    classified[risk > t["low_max"]] = 2
+    classified[risk > t["medium_max"]] = 3
+    classified[np.isnan(risk)] = 0
+    print("[MODEL] Risk classified (static thresholds)")
+    return classified
+
+
+def write_geotiff(
+    array: np.ndarray,
+    transform,
+    filename: str,
+    nodata: float = np.nan,
+) -> str:
+    """
+    Write a local 2D grid as a Cloud-Optimised GeoTIFF (256px tiles, zstd,
+    internal overviews). Returns the output file path.
+    """
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    out_path = os.path.join(config.OUTPUT_DIR, filename)
+
+    rows, cols = array.shape
+    # Floating-point predictor (3) only applies to float grids
+    predictor = 3 if np.issubdtype(array.dtype, np.floating) else 2
+    with rasterio.open(
+        out_path, "w",
+        driver="COG",
+        height=rows, width=cols, count=1,
+        dtype=array.dtype,
+        crs=config.CRS,
+        transform=transform,
+        nodata=nodata,
+        blocksize=256,
+        compress="zstd",
+        level=3,
+        predictor=predictor,
+        bigtiff="IF_SAFER",
+        overview_resampling="average",
+        num_threads="ALL_CPUS",
+    ) as dst:
+        dst.write(array, 1)
+    print(f"[EXPORT] GeoTIFF written → {out_path}")
+    return out_path
@@ -2,28 +2,56 @@
 GEE Data Module – Authentication, AOI creation, and remote-sensing data fetch.
 """
 
+import io
+import os
+import math
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
 import ee
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import reproject, Resampling
+from rasterio.windows import Window, bounds as window_bounds, transform as window_transform
+
 import config
 
 
 def initialize_ee(project_id: str = config.GEE_PROJECT_ID) -> None:
     """Authenticate (if needed) and initialise Earth Engine."""
     try:
-        ee.Initialize(project=project_id)
+        ee.Initialize(project=project_id, opt_url=config.GEE_API_URL)
     except Exception:
         ee.Authenticate()
-        ee.Initialize(project=project_id)
-    print(f"[GEE] Initialised with project: {project_id}")
+        ee.Initialize(project=project_id, opt_url=config.GEE_API_URL)
+    print(f"[GEE] Initialised with project: {project_id}"
+          + (f" ({config.GEE_API_URL})" if config.GEE_API_URL else ""))
+
 
+def create_aoi(lat: float, lon: float, radius_km: float, with_bounds: bool = False):
+    """
+    Return a circular AOI geometry centred on (lat, lon).
 
-def create_aoi(lat: float, lon: float, radius_km: float) -> ee.Geometry:
-    """Return a circular AOI geometry centred on (lat, lon)."""
+    With with_bounds=True, returns (aoi, bounds), where bounds is the
+    circumscribed (west, south, east, north) box computed locally – no
+    aoi.bounds().getInfo() round-trip needed.
+    """
     point = ee.Geometry.Point([lon, lat])
     aoi = point.buffer(radius_km * 1000)
     print(f"[GEE] AOI created – centre ({lat}, {lon}), radius {radius_km} km")
+    if with_bounds:
+        return aoi, aoi_bounds(lat, lon, radius_km)
     return aoi
 
 
+def aoi_bounds(lat: float, lon: float, radius_km: float) -> tuple:
+    """(west, south, east, north) box circumscribing the circular AOI."""
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * math.cos(math.radians(lat)))
+    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
 # ── DEM ──────────────────────────────────────────────────────────────────────
 
 def fetch_dem(aoi: ee.Geometry) -> ee.Image:
@@ -67,26 +95,46 @@ def fetch_soil(aoi: ee.Geometry) -> tuple[ee.Image, ee.Image]:
 
 # ── Numpy export helper ─────────────────────────────────────────────────────
 
-def ee_image_to_numpy(image: ee.Image, aoi: ee.Geometry, band: str = None):
+def ee_image_to_numpy(image: ee.Image, aoi: ee.Geometry, band: str = None, bounds: tuple = None):
     """
     Download a single-band EE image as a 2D NumPy array.
     Uses GeoTIFF download for reliable 2D shape.
-    """
-    import numpy as np
-    import urllib.request, io, rasterio
 
+    bounds: the AOI's (west, south, east, north).  When given and the
+    EXPORT_SCALE grid exceeds GEE_TILE_PIXELS a side, the grid is pinned
+    to the bounds and fetched as tiles downloaded in parallel.
+    """
     if band:
         image = image.select(band)
 
+    if bounds is not None:
+        step = config.EXPORT_SCALE / 111_320
+        west, south, east, north = bounds
+        cols = math.ceil((east - west) / step)
+        rows = math.ceil((north - south) / step)
+        if rows > config.GEE_TILE_PIXELS or cols > config.GEE_TILE_PIXELS:
+            grid = from_origin(west, north, step, step)
+
+            def fetch(win):
+                t = window_transform(win, grid)
+                url = image.getDownloadURL({
+                    "crs": config.CRS,
+                    "crs_transform": [t.a, t.b, t.c, t.d, t.e, t.f],
+                    "dimensions": f"{win.width}x{win.height}",
+                    "format": "GEO_TIFF",
+                })
+                with rasterio.open(io.BytesIO(urllib.request.urlopen(url).read())) as src:
+                    return src.read()
+
+            try:
+                arr = _download_tiled(rows, cols, fetch)[0]
+                print(f"[GEE] DEM downloaded as numpy – shape {arr.shape} (tiled)")
+                return arr
+            except Exception as e:
+                print(f"[GEE] Tiled download failed ({e}); trying single request")
+
     try:
-        url = image.getDownloadURL({
-            "scale": config.EXPORT_SCALE,
-            "crs": config.CRS,
-            "region": aoi,
-            "format": "GEO_TIFF",
-        })
-        response = urllib.request.urlopen(url)
-        data = response.read()
+        data = _download_geotiff(image, aoi)
         with rasterio.open(io.BytesIO(data)) as src:
             arr = src.read(1)
         print(f"[GEE] DEM downloaded as numpy – shape {arr.shape}")
@@ -99,3 +147,107 @@ def ee_image_to_numpy(image: ee.Image, aoi: ee.Geometry, band: str = None):
         print(f"[GEE] DEM via sampleRectangle – shape {arr.shape}")
         return arr
 
+
+# ── Local analysis grid ─────────────────────────────────────────────────────
+
+def aoi_pixel_mask(lat: float, lon: float, radius_km: float, transform, shape: tuple):
+    """Boolean grid mask, True where the pixel centre lies inside the circular AOI."""
+    rows, cols = shape
+    xs = transform.c + transform.a * (np.arange(cols) + 0.5)
+    ys = transform.f + transform.e * (np.arange(rows) + 0.5)
+    dx = (xs[None, :] - lon) * 111_320 * np.cos(np.radians(lat))
+    dy = (ys[:, None] - lat) * 111_320
+    return dx ** 2 + dy ** 2 <= (radius_km * 1000) ** 2
+
+
+def _download_geotiff(image: ee.Image, region) -> bytes:
+    """One getDownloadURL GeoTIFF request for *region* at EXPORT_SCALE."""
+    url = image.getDownloadURL({
+        "scale": config.EXPORT_SCALE,
+        "crs": config.CRS,
+        "region": region,
+        "format": "GEO_TIFF",
+    })
+    return urllib.request.urlopen(url).read()
+
+
+def _download_tiled(rows: int, cols: int, fetch):
+    """
+    Split a rows × cols grid into GEE_TILE_PIXELS-a-side windows, run
+    fetch(window) → (bands, h, w) array for each on a thread pool (keeping
+    each request under GEE's payload limit) and stitch the results into
+    one (bands, rows, cols) array.
+    """
+    tile = config.GEE_TILE_PIXELS
+    windows = [
+        Window(c0, r0, min(tile, cols - c0), min(tile, rows - r0))
+        for r0 in range(0, rows, tile)
+        for c0 in range(0, cols, tile)
+    ]
+    with ThreadPoolExecutor(max_workers=min(len(windows), 8)) as pool:
+        tiles = list(pool.map(fetch, windows))
+
+    out = np.empty((tiles[0].shape[0], rows, cols), dtype=tiles[0].dtype)
+    for win, t in zip(windows, tiles):
+        out[:, win.row_off:win.row_off + win.height, win.col_off:win.col_off + win.width] = t
+    return out
+
+
+def _reproject_geotiff(data: bytes, dst_transform, dst_shape: tuple):
+    """Resample every band of GeoTIFF *data* → float32 (bands, rows, cols)."""
+    with rasterio.open(io.BytesIO(data)) as src:
+        out = np.full((src.count, *dst_shape), np.nan, dtype=np.float32)
+        for b in range(src.count):
+            reproject(
+                source=rasterio.band(src, b + 1),
+                destination=out[b],
+                dst_transform=dst_transform,
+                dst_crs=config.CRS,
+                dst_nodata=np.nan,
+                resampling=Resampling.bilinear,
+                num_threads=os.cpu_count() or 1,
+            )
+    return out
+
+
+def ee_image_to_grid(image: ee.Image, aoi: ee.Geometry, dst_transform, dst_shape: tuple):
+    """
+    Download an EE image (any number of bands) and resample every band
+    onto a fixed local grid (e.g. the river-proximity grid).
+
+    Grids up to GEE_TILE_PIXELS a side come down in one request; larger
+    ones are split into tiles downloaded in parallel (keeping each
+    request under GEE's payload limit) and stitched locally.
+
+    Returns a float32 array of shape (bands, rows, cols), NaN where the
+    source has no data.
+    """
+    rows, cols = dst_shape
+    tile = config.GEE_TILE_PIXELS
+    if rows <= tile and cols <= tile:
+        out = _reproject_geotiff(_download_geotiff(image, aoi), dst_transform, dst_shape)
+        print(f"[GEE] {out.shape[0]}-band image resampled onto {cols}×{rows} grid")
+        return out
+
+    # Two source pixels of margin so bilinear samples at tile edges have
+    # their neighbours
+    margin = 2 * config.EXPORT_SCALE / 111_320
+
+    def fetch(win):
+        west, south, east, north = window_bounds(win, dst_transform)
+        region = ee.Geometry.Rectangle(
+            [west - margin, south - margin, east + margin, north + margin],
+            proj=config.CRS, geodesic=False,
+        )
+        return _reproject_geotiff(
+            _download_geotiff(image, region),
+            window_transform(win, dst_transform), (win.height, win.width),
+        )
+
+    out = _download_tiled(rows, cols, fetch)
+    n_tiles = math.ceil(rows / tile) * math.ceil(cols / tile)
+    print(
+        f"[GEE] {out.shape[0]}-band image resampled onto {cols}×{rows} grid "
+        f"({n_tiles} tiles)"
+    )
+    return out
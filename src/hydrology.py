@@ -2,17 +2,30 @@
 Hydrology Module – River proximity and flow accumulation factors.
 """
 
+import os
+import math
+import hashlib
 import numpy as np
 import osmnx as ox
+from numba import get_num_threads, njit, prange
 import geopandas as gpd
 from scipy import ndimage
+import shapely
+from shapely import STRtree
 from shapely.geometry import box
 import rasterio
 from rasterio.features import rasterize
+from rasterio.io import MemoryFile
 from rasterio.transform import from_bounds
 
 import config
 
+try:
+    # Optional: multi-threaded Saito/Felzenszwalb EDT (pip install edt)
+    from edt import edt as _fast_edt
+except ImportError:
+    _fast_edt = None
+
 
 # ── River / Water Feature Proximity ─────────────────────────────────────────
 
@@ -44,6 +57,18 @@ def fetch_water_features(lat: float, lon: float, radius_m: float) -> gpd.GeoData
     return combined
 
 
+def raster_shape(bounds: tuple, scale: int = config.EXPORT_SCALE) -> tuple:
+    """(height, width) of the *scale*-metre local grid over *bounds*."""
+    west, south, east, north = bounds
+    mid_lat = (south + north) / 2
+    deg_per_pixel_lon = scale / (111_320 * math.cos(math.radians(mid_lat)))
+    deg_per_pixel_lat = scale / 111_320
+
+    width = max(1, int((east - west) / deg_per_pixel_lon))
+    height = max(1, int((north - south) / deg_per_pixel_lat))
+    return height, width
+
+
 def compute_river_proximity(
     water_gdf: gpd.GeoDataFrame,
     bounds: tuple,  # (west, south, east, north)
@@ -58,17 +83,8 @@ def compute_river_proximity(
         water_mask: 2D binary array (1 = water pixel, 0 = land)
         raster_meta: dict with transform, shape, bounds
     """
-    import math
-
     west, south, east, north = bounds
-
-    # Compute grid dimensions from bounds and scale
-    mid_lat = (south + north) / 2
-    deg_per_pixel_lon = scale / (111_320 * math.cos(math.radians(mid_lat)))
-    deg_per_pixel_lat = scale / 111_320
-
-    width = max(1, int((east - west) / deg_per_pixel_lon))
-    height = max(1, int((north - south) / deg_per_pixel_lat))
+    height, width = raster_shape(bounds, scale)
 
     transform = from_bounds(west, south, east, north, width, height)
 
@@ -77,21 +93,45 @@ def compute_river_proximity(
         water_mask = np.zeros((height, width), dtype=np.uint8)
         print("[HYDRO] No water features → river factor = 0 everywhere")
     else:
+        # Only features that touch the raster (OSM returns whatever crosses
+        # the query radius); one STRtree bbox query + exact intersects
+        geoms = water_gdf.geometry.dropna().to_numpy()
+        geoms = geoms[STRtree(geoms).query(box(west, south, east, north), predicate="intersects")]
+
+        # Same features on the same grid → same factors; reuse from disk
+        digest = hashlib.sha1(repr((bounds, scale, width, height)).encode())
+        for wkb in shapely.to_wkb(geoms):
+            digest.update(wkb)
+        cache_path = os.path.join(config.CACHE_DIR, f"water_{digest.hexdigest()[:16]}.npz")
+        cached = _load_water_cache(cache_path)
+        if cached is not None:
+            river_factor, water_mask = cached
+            print(f"[HYDRO] River proximity loaded from {cache_path}")
+            return river_factor, water_mask, {
+                "transform": transform, "width": width, "height": height, "bounds": bounds,
+            }
+
         # Rasterize: 1 where water exists, 0 elsewhere
-        geometries = [(geom, 1) for geom in water_gdf.geometry if geom is not None]
-        water_raster = rasterize(
-            geometries,
-            out_shape=(height, width),
-            transform=transform,
-            fill=0,
-            dtype=np.uint8,
-        )
+        if len(geoms):
+            water_raster = rasterize(
+                ((geom, 1) for geom in geoms),
+                out_shape=(height, width),
+                transform=transform,
+                fill=0,
+                dtype=np.uint8,
+            )
+        else:
+            water_raster = np.zeros((height, width), dtype=np.uint8)
 
         # Keep binary water mask
         water_mask = water_raster.copy()
 
-        # Euclidean distance from nearest water pixel
-        dist = ndimage.distance_transform_edt(water_raster == 0)
+        # Euclidean distance from nearest water pixel (edt returns inf when
+        # there is no water pixel at all, so that case stays on SciPy)
+        if _fast_edt is not None and water_raster.any():
+            dist = _fast_edt(water_raster == 0, parallel=0).astype(np.float64)
+        else:
+            dist = ndimage.distance_transform_edt(water_raster == 0)
 
         # Normalise to [0, 1] and invert (closer = higher risk)
         d_max = dist.max()
@@ -104,6 +144,7 @@ def compute_river_proximity(
         print(f"[HYDRO] River proximity computed – grid {width}×{height}, "
               f"range [{river_factor.min():.3f}, {river_factor.max():.3f}]")
         print(f"[HYDRO] Water mask: {water_mask.sum()} water pixels out of {water_mask.size}")
+        _save_water_cache(cache_path, river_factor, water_mask)
 
     meta = {
         "transform": transform,
@@ -114,8 +155,235 @@ def compute_river_proximity(
     return river_factor, water_mask, meta
 
 
+def _load_water_cache(path: str):
+    """(river_factor, water_mask) from a compute_river_proximity cache file, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            return data["river"], data["mask"]
+    except Exception as e:
+        print(f"[HYDRO] Could not read {path}: {e}")
+        return None
+
+
+def _save_water_cache(path: str, river_factor: np.ndarray, water_mask: np.ndarray) -> None:
+    """Write the factors atomically (temp file + rename); failures only warn."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, river=river_factor, mask=water_mask)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[HYDRO] Could not cache river proximity to {path}: {e}")
+
+
 # ── Flow Accumulation / TWI ─────────────────────────────────────────────────
 
+# D8 direction offsets: (row_offset, col_offset)
+_D8_OFFSETS = np.array([
+    [-1, -1], [-1, 0], [-1, 1],
+    [0, -1],           [0, 1],
+    [1, -1],  [1, 0],  [1, 1],
+], dtype=np.int64)
+
+
+@njit(cache=True, parallel=True)
+def _d8_flow_dir(dem, offsets):
+    """
+    Index of the steepest strictly-downhill neighbour per cell (-1 if none
+    or off-grid; NaN compares False).  The first of equal drops wins.
+    Rows are independent, so the scan runs in parallel.
+    """
+    rows, cols = dem.shape
+    flow_dir = np.full((rows, cols), -1, dtype=np.int8)
+    for r in prange(rows):
+        for c in range(cols):
+            z = dem[r, c]
+            best = np.float32(0.0)
+            for k in range(offsets.shape[0]):
+                rr, cc = r + offsets[k, 0], c + offsets[k, 1]
+                if 0 <= rr < rows and 0 <= cc < cols:
+                    drop = z - dem[rr, cc]
+                    if drop > best:
+                        best = drop
+                        flow_dir[r, c] = k
+    return flow_dir
+
+
+@njit(cache=True)
+def _accumulate_downstream(flow_dir, offsets, flow_accum):
+    """
+    Push each cell's count to its D8 receiver in topological order
+    (Kahn: a cell is pushed once all its donors have been), in place.
+    O(n) – no elevation sort needed, since flow is strictly downhill.
+    """
+    rows, cols = flow_dir.shape
+    n = rows * cols
+    receiver = np.full(n, -1, dtype=np.int64)
+    in_degree = np.zeros(n, dtype=np.int32)
+    for i in range(n):
+        d = flow_dir[i // cols, i % cols]
+        if d >= 0:
+            j = (i // cols + offsets[d, 0]) * cols + (i % cols + offsets[d, 1])
+            receiver[i] = j
+            in_degree[j] += 1
+
+    acc = flow_accum.ravel()
+    stack = np.empty(n, dtype=np.int64)
+    top = 0
+    for i in range(n):
+        if in_degree[i] == 0:
+            stack[top] = i
+            top += 1
+    while top > 0:
+        top -= 1
+        i = stack[top]
+        j = receiver[i]
+        if j >= 0:
+            acc[j] += acc[i]
+            in_degree[j] -= 1
+            if in_degree[j] == 0:
+                stack[top] = j
+                top += 1
+
+
+# Tile side for _accumulate_tiled; grids that fit in one tile (or runs
+# with a single numba thread, where tiling is pure overhead) use the
+# serial kernel
+_FA_TILE = 256
+
+
+@njit(cache=True, parallel=True)
+def _accumulate_tiled(flow_dir, offsets, flow_accum, tile):
+    """
+    _accumulate_downstream() split into tile × tile blocks processed in
+    parallel (Barnes 2016, "Parallel non-divergent flow accumulation").
+
+    1. Per tile: Kahn accumulation over the tile's own cells, recording
+       the topological order and, for every cell, the cell where its
+       flow path leaves the tile (-1 if it ends in a pit inside).
+    2. Serially, over the tile-exit cells only: route each exit's total
+       (in-tile accumulation plus whatever entered upstream of it) to the
+       entry cell in the neighbouring tile.
+    3. Per tile: push those entry contributions downstream in the order
+       from step 1.
+    In place; same counts as the serial kernel.
+    """
+    rows, cols = flow_dir.shape
+    n = rows * cols
+    acc = flow_accum.ravel()
+    t_cols = (cols + tile - 1) // tile
+    n_tiles = ((rows + tile - 1) // tile) * t_cols
+
+    receiver = np.full(n, -1, dtype=np.int64)
+    for r in prange(rows):
+        for c in range(cols):
+            d = flow_dir[r, c]
+            if d >= 0:
+                receiver[r * cols + c] = (r + offsets[d, 0]) * cols + (c + offsets[d, 1])
+
+    starts = np.zeros(n_tiles + 1, dtype=np.int64)
+    for t in range(n_tiles):
+        r0, c0 = (t // t_cols) * tile, (t % t_cols) * tile
+        starts[t + 1] = starts[t] + min(tile, rows - r0) * min(tile, cols - c0)
+
+    order = np.empty(n, dtype=np.int64)
+    exit_cell = np.full(n, -1, dtype=np.int64)
+    in_degree = np.zeros(n, dtype=np.int32)
+
+    # 1. In-tile accumulation
+    for t in prange(n_tiles):
+        r0, c0 = (t // t_cols) * tile, (t % t_cols) * tile
+        r1, c1 = min(r0 + tile, rows), min(c0 + tile, cols)
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                j = receiver[r * cols + c]
+                if j >= 0 and r0 <= j // cols < r1 and c0 <= j % cols < c1:
+                    in_degree[j] += 1
+
+        stack = np.empty((r1 - r0) * (c1 - c0), dtype=np.int64)
+        top = 0
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                if in_degree[r * cols + c] == 0:
+                    stack[top] = r * cols + c
+                    top += 1
+        base = starts[t]
+        count = 0
+        while top > 0:
+            top -= 1
+            i = stack[top]
+            order[base + count] = i
+            count += 1
+            j = receiver[i]
+            if j >= 0 and r0 <= j // cols < r1 and c0 <= j % cols < c1:
+                acc[j] += acc[i]
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    stack[top] = j
+                    top += 1
+
+        # Downstream first, so each cell's receiver already knows its exit
+        for k in range(count - 1, -1, -1):
+            i = order[base + k]
+            j = receiver[i]
+            if j >= 0:
+                if r0 <= j // cols < r1 and c0 <= j % cols < c1:
+                    exit_cell[i] = exit_cell[j]
+                else:
+                    exit_cell[i] = i
+
+    # 2. Perimeter graph: exit e feeds the exit its entry cell drains to
+    exits = np.empty(n, dtype=np.int64)
+    n_exits = 0
+    for i in range(n):
+        if exit_cell[i] == i:
+            exits[n_exits] = i
+            n_exits += 1
+
+    outflow = np.zeros(n, dtype=acc.dtype)
+    link_degree = np.zeros(n, dtype=np.int32)
+    for k in range(n_exits):
+        e = exits[k]
+        outflow[e] = acc[e]
+        nxt = exit_cell[receiver[e]]
+        if nxt >= 0:
+            link_degree[nxt] += 1
+
+    extra = np.zeros(n, dtype=acc.dtype)
+    stack = np.empty(n_exits, dtype=np.int64)
+    top = 0
+    for k in range(n_exits):
+        if link_degree[exits[k]] == 0:
+            stack[top] = exits[k]
+            top += 1
+    while top > 0:
+        top -= 1
+        e = stack[top]
+        extra[receiver[e]] += outflow[e]
+        nxt = exit_cell[receiver[e]]
+        if nxt >= 0:
+            outflow[nxt] += outflow[e]
+            link_degree[nxt] -= 1
+            if link_degree[nxt] == 0:
+                stack[top] = nxt
+                top += 1
+
+    # 3. Push entry contributions through each tile
+    for t in prange(n_tiles):
+        r0, c0 = (t // t_cols) * tile, (t % t_cols) * tile
+        r1, c1 = min(r0 + tile, rows), min(c0 + tile, cols)
+        for k in range(starts[t], starts[t + 1]):
+            i = order[k]
+            x = extra[i]
+            if x != 0:
+                acc[i] += x
+                j = receiver[i]
+                if j >= 0 and r0 <= j // cols < r1 and c0 <= j % cols < c1:
+                    extra[j] += x
+
+
 def compute_flow_accumulation(dem_array: np.ndarray) -> np.ndarray:
     """
     Compute a simplified flow accumulation from a DEM using the D8 algorithm.
@@ -124,42 +392,19 @@ def compute_flow_accumulation(dem_array: np.ndarray) -> np.ndarray:
     This is a local approximation — for production use, consider
     pysheds or WhiteboxTools.
 
-    Returns a 2D array of flow accumulation counts.
+    Returns a 2D float32 array of flow accumulation counts (exact up to
+    2**24 cells).
     """
-    rows, cols = dem_array.shape
-    flow_accum = np.ones((rows, cols), dtype=np.float64)
-
-    # D8 direction offsets: (row_offset, col_offset)
-    neighbors = [
-        (-1, -1), (-1, 0), (-1, 1),
-        (0, -1),           (0, 1),
-        (1, -1),  (1, 0),  (1, 1),
-    ]
-
-    # Compute flow direction for each cell (index of steepest downhill neighbour)
-    flow_dir = np.full((rows, cols), -1, dtype=np.int8)
-    for r in range(rows):
-        for c in range(cols):
-            steepest_drop = 0
-            best_idx = -1
-            for idx, (dr, dc) in enumerate(neighbors):
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    drop = dem_array[r, c] - dem_array[nr, nc]
-                    if drop > steepest_drop:
-                        steepest_drop = drop
-                        best_idx = idx
-            flow_dir[r, c] = best_idx
-
-    # Sort cells by elevation (highest first) and accumulate downstream
-    flat_indices = np.argsort(-dem_array.ravel())
-    for flat_idx in flat_indices:
-        r, c = divmod(flat_idx, cols)
-        d = flow_dir[r, c]
-        if d >= 0:
-            dr, dc = neighbors[d]
-            nr, nc = r + dr, c + dc
-            flow_accum[nr, nc] += flow_accum[r, c]
+    # float32 throughout: GEE DEMs are float32 already, and it halves the
+    # bytes touched by the direction scan and the downstream walk
+    dem_array = np.ascontiguousarray(dem_array, dtype=np.float32)
+    flow_accum = np.ones(dem_array.shape, dtype=np.float32)
+
+    flow_dir = _d8_flow_dir(dem_array, _D8_OFFSETS)
+    if max(dem_array.shape) > _FA_TILE and get_num_threads() > 1:
+        _accumulate_tiled(flow_dir, _D8_OFFSETS, flow_accum, _FA_TILE)
+    else:
+        _accumulate_downstream(flow_dir, _D8_OFFSETS, flow_accum)
 
     print(f"[HYDRO] Flow accumulation computed – "
           f"max: {flow_accum.max():.0f}, mean: {flow_accum.mean():.1f}")
@@ -183,27 +428,108 @@ def normalize_flow_accumulation(flow_accum: np.ndarray) -> np.ndarray:
     return normalised.astype(np.float32)
 
 
+# ── Local slope ─────────────────────────────────────────────────────────────
+
+_SOBEL_X = np.array([[-1, 0, 1],
+                     [-2, 0, 2],
+                     [-1, 0, 1]], dtype=np.float64) / 8.0
+
+
+def compute_slope_numpy(dem_array: np.ndarray, cell_size) -> np.ndarray:
+    """
+    Slope in degrees from a local DEM grid (same units as ee.Terrain.slope),
+    via Horn's 3×3 Sobel gradient – two whole-array correlations.
+
+    cell_size: pixel size in metres, a scalar or (dx, dy) for grids whose
+    x and y spacing differ (e.g. degrees at non-zero latitude).
+    Edges use nearest-pixel padding; NaN pixels propagate.
+    """
+    dx, dy = (cell_size, cell_size) if np.isscalar(cell_size) else cell_size
+    dem = np.asarray(dem_array, dtype=np.float64)
+    dzdx = ndimage.correlate(dem, _SOBEL_X / dx, mode="nearest")
+    dzdy = ndimage.correlate(dem, _SOBEL_X.T / dy, mode="nearest")
+    slope = np.degrees(np.arctan(np.hypot(dzdx, dzdy)))
+    print(f"[HYDRO] Local slope computed – max {np.nanmax(slope):.1f}°")
+    return slope.astype(np.float32)
+
+
 # ── Convert numpy arrays to EE images ───────────────────────────────────────
 
+def _compact_dtype(array: np.ndarray) -> np.ndarray:
+    """
+    Narrowest dtype that holds the raster losslessly at model precision:
+    masks / class codes in [0, 255] become uint8, everything else float32.
+    """
+    if array.dtype == bool or (np.issubdtype(array.dtype, np.integer)
+                               and array.min() >= 0 and array.max() <= 255):
+        return np.ascontiguousarray(array, dtype=np.uint8)
+    return np.ascontiguousarray(array, dtype=np.float32)
+
+
+def _upload_cog(array: np.ndarray, bounds: tuple, bucket_name: str) -> str:
+    """
+    Write the array as a COG to gs://<bucket>/flood_cache/<hash>.tif and
+    return the URI. The name is a content hash of array + bounds, so
+    repeated calls with the same raster skip the upload.
+    """
+    from google.cloud import storage
+
+    array = _compact_dtype(array)
+    digest = hashlib.sha1(array.tobytes())
+    digest.update(repr((array.dtype.str, array.shape, tuple(bounds))).encode())
+    blob_name = f"flood_cache/{digest.hexdigest()}.tif"
+
+    blob = storage.Client(project=config.GEE_PROJECT_ID).bucket(bucket_name).blob(blob_name)
+    if not blob.exists():
+        rows, cols = array.shape
+        profile = {
+            "driver": "COG", "height": rows, "width": cols, "count": 1,
+            "dtype": array.dtype.name, "crs": config.CRS,
+            "transform": from_bounds(*bounds, cols, rows),
+            # horizontal differencing for integers, floating-point for floats
+            "compress": "zstd", "predictor": 2 if array.dtype == np.uint8 else 3,
+        }
+        with MemoryFile() as mem:
+            with mem.open(**profile) as dst:
+                dst.write(array, 1)
+            blob.upload_from_string(mem.read(), content_type="image/tiff")
+    return f"gs://{bucket_name}/{blob_name}"
+
+
 def numpy_to_ee_image(
     array: np.ndarray,
     bounds: tuple,
     band_name: str = "factor",
 ) -> "ee.Image":
     """
-    Convert a 2D numpy array to a GEE image by uploading as a constant
-    raster aligned to the given bounds.
+    Convert a 2D numpy array to a GEE image aligned to the given bounds.
 
-    Uses ee.Image.pixelLonLat() trick: build a lookup from the array
-    and paint it onto the GEE grid.
+    With config.GEE_CACHE_BUCKET set, the array is uploaded once as a COG
+    and referenced via ee.Image.loadGeoTIFF (request size is one URL).
+    Otherwise falls back to the ee.Image.pixelLonLat() trick: build a
+    lookup from the array and paint it onto the GEE grid.
     """
     import ee
 
     west, south, east, north = bounds
     rows, cols = array.shape
+    aoi = ee.Geometry.Rectangle([west, south, east, north])
 
-    # Flatten and create a list image
-    flat = array.ravel().tolist()
+    if config.GEE_CACHE_BUCKET:
+        try:
+            uri = _upload_cog(array, bounds, config.GEE_CACHE_BUCKET)
+            return ee.Image.loadGeoTIFF(uri).rename(band_name).clip(aoi)
+        except Exception as e:
+            print(f"[HYDRO] COG upload failed ({e}); embedding array instead")
+
+    # Flatten and create a list image. Integer masks serialise as bare
+    # ints; floats are rounded to float32 resolution so each value is a
+    # short literal rather than a 17-digit float64 repr.
+    array = _compact_dtype(array)
+    if array.dtype == np.uint8:
+        flat = array.ravel().tolist()
+    else:
+        flat = np.round(array.astype(np.float64), 7).ravel().tolist()
 
     # Create a coordinate-based image
     lon_img = ee.Image.pixelLonLat().select("longitude")
@@ -222,5 +548,4 @@ def numpy_to_ee_image(
     array_img = ee.Image(ee.Array(flat)).arrayGet(linear_idx).rename(band_name)
 
     # Clip to bounds
-    aoi = ee.Geometry.Rectangle([west, south, east, north])
     return array_img.clip(aoi)
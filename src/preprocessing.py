@@ -3,20 +3,39 @@ Preprocessing Module – Normalise elevation, slope, and soil into [0, 1] factor
 """
 
 import ee
+import numpy as np
 import config
 
 
-def normalize_elevation(dem: ee.Image, aoi: ee.Geometry) -> ee.Image:
+def terrain_min_max(dem: ee.Image, slope: ee.Image, aoi: ee.Geometry) -> ee.Dictionary:
     """
-    Lower elevation → higher flood risk.
-    Returns inverted min-max normalisation in [0, 1].
+    AOI min/max of elevation and slope from ONE reduceRegion over the
+    stacked bands (keys elevation_min/max, slope_min/max).  Stays lazy –
+    pass it to normalize_elevation / normalize_slope so both share it.
     """
-    stats = dem.reduceRegion(
+    return ee.Image.cat([dem, slope]).reduceRegion(
         reducer=ee.Reducer.minMax(),
         geometry=aoi,
         scale=config.EXPORT_SCALE,
         maxPixels=config.MAX_PIXELS,
+        tileScale=config.TILE_SCALE,
     )
+
+
+def normalize_elevation(dem: ee.Image, aoi: ee.Geometry, stats: ee.Dictionary = None) -> ee.Image:
+    """
+    Lower elevation → higher flood risk.
+    Returns inverted min-max normalisation in [0, 1].
+    stats: optional terrain_min_max() result to reuse.
+    """
+    if stats is None:
+        stats = dem.reduceRegion(
+            reducer=ee.Reducer.minMax(),
+            geometry=aoi,
+            scale=config.EXPORT_SCALE,
+            maxPixels=config.MAX_PIXELS,
+            tileScale=config.TILE_SCALE,
+        )
     elev_min = ee.Number(stats.get("elevation_min"))
     elev_max = ee.Number(stats.get("elevation_max"))
 
@@ -26,17 +45,20 @@ def normalize_elevation(dem: ee.Image, aoi: ee.Geometry) -> ee.Image:
     return inverted
 
 
-def normalize_slope(slope: ee.Image, aoi: ee.Geometry) -> ee.Image:
+def normalize_slope(slope: ee.Image, aoi: ee.Geometry, stats: ee.Dictionary = None) -> ee.Image:
     """
     Flatter terrain → higher flood accumulation risk.
     Returns inverted min-max normalisation in [0, 1].
+    stats: optional terrain_min_max() result to reuse.
     """
-    stats = slope.reduceRegion(
-        reducer=ee.Reducer.minMax(),
-        geometry=aoi,
-        scale=config.EXPORT_SCALE,
-        maxPixels=config.MAX_PIXELS,
-    )
+    if stats is None:
+        stats = slope.reduceRegion(
+            reducer=ee.Reducer.minMax(),
+            geometry=aoi,
+            scale=config.EXPORT_SCALE,
+            maxPixels=config.MAX_PIXELS,
+            tileScale=config.TILE_SCALE,
+        )
     slope_min = ee.Number(stats.get("slope_min"))
     slope_max = ee.Number(stats.get("slope_max"))
 
@@ -66,6 +88,14 @@ def validate_range(image: ee.Image, aoi: ee.Geometry, label: str) -> dict:
         geometry=aoi,
         scale=config.EXPORT_SCALE,
         maxPixels=config.MAX_PIXELS,
+        tileScale=config.TILE_SCALE,
     ).getInfo()
     print(f"[VAL] {label}: {stats}")
     return stats
+
+
+def validate_range_np(array: np.ndarray, label: str) -> dict:
+    """NumPy twin of validate_range() for local grids (NaN = outside AOI)."""
+    stats = {"min": float(np.nanmin(array)), "max": float(np.nanmax(array))}
+    print(f"[VAL] {label}: {stats}")
+    return stats
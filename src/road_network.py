@@ -1,17 +1,19 @@
 """
 Road Network Module – Load OSM roads, overlay flood risk, detect safe zones.
 
-Graph is built once per AOI and cached.  Risk sampling uses multiprocessing
-for performance on multi-core machines (Apple M4, etc.).
+Graph is built once per AOI and cached (in memory and on disk).  Risk
+sampling is a vectorised raster gather over all edge midpoints / nodes
+at once.
 """
 
 import os
-import math
+import pickle
+import time
 import osmnx as ox
 import networkx as nx
 import numpy as np
 import rasterio
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from rasterio.windows import Window
 
 import config
 
@@ -25,12 +27,12 @@ def load_road_network(
 ) -> nx.MultiDiGraph:
     """
     Download drivable road graph from OSM.  Cached by (lat, lon, radius_m)
-    so repeated calls with the same AOI return instantly.
+    in memory and as a pickle under config.CACHE_DIR (valid for
+    config.ROAD_CACHE_TTL_S), so repeated calls and later runs with the
+    same AOI return instantly.
 
     Retries up to 3 times on transient Overpass API failures.
     """
-    import time
-
     global _cached_graph, _cached_key
     key = (round(lat, 4), round(lon, 4), int(radius_m))
 
@@ -38,6 +40,21 @@ def load_road_network(
         print(f"[ROAD] Using cached graph ({_cached_graph.number_of_nodes()} nodes)")
         return _cached_graph
 
+    pkl_path = os.path.join(
+        config.CACHE_DIR, f"road_{key[0]}_{key[1]}_{key[2]}.pkl"
+    )
+    if not force and os.path.exists(pkl_path) \
+            and time.time() - os.path.getmtime(pkl_path) < config.ROAD_CACHE_TTL_S:
+        try:
+            with open(pkl_path, "rb") as f:
+                G = pickle.load(f)
+            print(f"[ROAD] Loaded cached graph from {pkl_path} ({G.number_of_nodes()} nodes)")
+            _cached_graph = G
+            _cached_key = key
+            return G
+        except Exception as e:
+            print(f"[ROAD] Could not read {pkl_path}: {e}")
+
     max_retries = 3
     for attempt in range(1, max_retries + 1):
         try:
@@ -48,6 +65,7 @@ def load_road_network(
                 simplify=True,
             )
             print(f"[ROAD] Loaded {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+            _save_graph(G, pkl_path)
             _cached_graph = G
             _cached_key = key
             return G
@@ -62,25 +80,100 @@ def load_road_network(
                 raise
 
 
-# ── Parallel risk sampling ──────────────────────────────────────────────────
+def _save_graph(G: nx.MultiDiGraph, pkl_path: str) -> None:
+    """Pickle the graph atomically (temp file + rename); failures only warn."""
+    try:
+        os.makedirs(os.path.dirname(pkl_path), exist_ok=True)
+        tmp_path = f"{pkl_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, pkl_path)
+    except Exception as e:
+        print(f"[ROAD] Could not cache graph to {pkl_path}: {e}")
+
+
+# ── Flat coordinate arrays ──────────────────────────────────────────────────
+
+def coord_arrays(G: nx.MultiDiGraph) -> dict:
+    """
+    Structure-of-arrays view of the graph geometry, built once and kept on
+    G.graph["_coords"]: node order ("nodes"), node "lon"/"lat", and per
+    edge in G.edges() order the (u, v, k) "keys" plus "u"/"v" as dense
+    node indices.  "indptr" makes (indptr, v) the CSR adjacency of the
+    topology, independent of edge weights.
+
+    Rebuilt if the node count has changed; code that adds or removes
+    edges must drop G.graph["_coords"] (penalize_flooded_edges does) –
+    counting MultiDiGraph edges is itself an O(E) walk.
+    """
+    coords = G.graph.get("_coords")
+    if coords is not None and len(coords["nodes"]) == len(G):
+        return coords
+
+    node_xy = [(n, d["x"], d["y"]) for n, d in G.nodes(data=True)]
+    n = len(node_xy)
+    nodes = [nd for nd, _, _ in node_xy]
+    idx = {nd: i for i, nd in enumerate(nodes)}
+    keys = list(G.edges(keys=True))
+    m = len(keys)
+    u_idx = np.fromiter((idx[u] for u, _, _ in keys), dtype=np.int64, count=m)
+    # G.edges() walks the adjacency node by node, so edges arrive grouped
+    # by tail in `nodes` order – indptr is just the cumulative out-degree
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u_idx, minlength=n), out=indptr[1:])
+    coords = {
+        "nodes": nodes,
+        "lon": np.fromiter((x for _, x, _ in node_xy), dtype=np.float64, count=n),
+        "lat": np.fromiter((y for _, _, y in node_xy), dtype=np.float64, count=n),
+        "keys": keys,
+        "u": u_idx,
+        "v": np.fromiter((idx[v] for _, v, _ in keys), dtype=np.int64, count=m),
+        "indptr": indptr,
+    }
+    G.graph["_coords"] = coords
+    return coords
+
+
+# ── Risk sampling ───────────────────────────────────────────────────────────
+
+def _sample_points(src, xs, ys):
+    """
+    Nearest-pixel band-1 values at (xs, ys) in one vector pass: inverse
+    affine on the whole coordinate arrays, round half-to-even like round(),
+    then a single gather.  Points off the raster read 0.0.
+
+    Only the window bounding the points is read, so a sparse or local
+    sample decodes just the tiles it touches rather than the full band.
+    """
+    ia, ib, ic, id_, ie, if_ = (~src.transform)[:6]
+    col_idx = np.rint(xs * ia + ys * ib + ic).astype(np.int64)
+    row_idx = np.rint(xs * id_ + ys * ie + if_).astype(np.int64)
+    inside = ((row_idx >= 0) & (row_idx < src.height)
+              & (col_idx >= 0) & (col_idx < src.width))
+    values = np.zeros(len(xs), dtype=np.float64)
+    if not inside.any():
+        return values
+
+    row_idx, col_idx = row_idx[inside], col_idx[inside]
+    r0, c0 = int(row_idx.min()), int(col_idx.min())
+    window = Window(c0, r0, int(col_idx.max()) - c0 + 1, int(row_idx.max()) - r0 + 1)
+    band = src.read(1, window=window)
+    values[inside] = band[row_idx - r0, col_idx - c0]
+    return values
+
+
+def sample_edge_risk(G: nx.MultiDiGraph, risk_tif_path: str) -> np.ndarray:
+    """
+    Flood risk at each edge midpoint, in G.edges() order, as an array –
+    G is not modified, so a graph shared between jobs stays untouched.
+    """
+    coords = coord_arrays(G)
+    lon, lat, u, v = coords["lon"], coords["lat"], coords["u"], coords["v"]
+    mid_lons = (lon[u] + lon[v]) * 0.5
+    mid_lats = (lat[u] + lat[v]) * 0.5
 
-def _sample_chunk(args):
-    """Worker function: sample risk values for a chunk of edges."""
-    risk_tif_path, edge_midpoints = args
-    results = {}
     with rasterio.open(risk_tif_path) as src:
-        transform = src.transform
-        band = src.read(1)
-        rows, cols = band.shape
-
-        for edge_key, (mid_lon, mid_lat) in edge_midpoints.items():
-            col_idx, row_idx = ~transform * (mid_lon, mid_lat)
-            row_idx, col_idx = int(round(row_idx)), int(round(col_idx))
-            if 0 <= row_idx < rows and 0 <= col_idx < cols:
-                results[edge_key] = float(band[row_idx, col_idx])
-            else:
-                results[edge_key] = 0.0
-    return results
+        return _sample_points(src, mid_lons, mid_lats)
 
 
 def sample_risk_on_edges(
@@ -89,50 +182,14 @@ def sample_risk_on_edges(
     n_workers: int = None,
 ) -> nx.MultiDiGraph:
     """
-    Sample flood risk at each edge midpoint.  Uses multiprocessing
-    to parallelise I/O across CPU cores.
-    """
-    if n_workers is None:
-        n_workers = min(os.cpu_count() or 4, 8)
-
-    # Collect all edge midpoints
-    edge_midpoints = {}
-    for u, v, k, data in G.edges(keys=True, data=True):
-        u_d, v_d = G.nodes[u], G.nodes[v]
-        mid_lon = (u_d["x"] + v_d["x"]) / 2
-        mid_lat = (u_d["y"] + v_d["y"]) / 2
-        edge_midpoints[(u, v, k)] = (mid_lon, mid_lat)
-
-    total = len(edge_midpoints)
-
-    # For small graphs, just do it in-process (avoid IPC overhead)
-    if total < 500 or n_workers <= 1:
-        results = _sample_chunk((risk_tif_path, edge_midpoints))
-        for (u, v, k), risk in results.items():
-            G.edges[u, v, k]["flood_risk"] = risk
-        print(f"[ROAD] Flood risk sampled on {total} edges (single-thread)")
-        return G
-
-    # Split into chunks for parallel workers
-    keys = list(edge_midpoints.keys())
-    chunk_size = math.ceil(total / n_workers)
-    chunks = []
-    for i in range(0, total, chunk_size):
-        chunk_keys = keys[i : i + chunk_size]
-        chunk_dict = {k: edge_midpoints[k] for k in chunk_keys}
-        chunks.append((risk_tif_path, chunk_dict))
-
-    # Execute in parallel
-    all_results = {}
-    with ProcessPoolExecutor(max_workers=n_workers) as pool:
-        futures = [pool.submit(_sample_chunk, c) for c in chunks]
-        for f in as_completed(futures):
-            all_results.update(f.result())
-
-    for (u, v, k), risk in all_results.items():
-        G.edges[u, v, k]["flood_risk"] = risk
-
-    print(f"[ROAD] Flood risk sampled on {total} edges ({n_workers} workers)")
+    Sample flood risk at each edge midpoint in one vectorised in-process
+    pass (a gather over a band read once) and store it as the edges'
+    flood_risk attribute.  n_workers is accepted for backward
+    compatibility and ignored (there is no worker pool any more).
+    """
+    values = sample_edge_risk(G, risk_tif_path)
+    nx.set_edge_attributes(G, dict(zip(coord_arrays(G)["keys"], values.tolist())), "flood_risk")
+    print(f"[ROAD] Flood risk sampled on {len(values)} edges")
     return G
 
 
@@ -147,15 +204,20 @@ def penalize_flooded_edges(
     - Remove edges with flood_risk >= remove_threshold (impassable).
     - Scale remaining risky edges: length *= (1 + risk * penalty_factor).
     """
-    edges_to_remove = []
-    for u, v, k, data in G.edges(keys=True, data=True):
-        risk = data.get("flood_risk", 0.0)
-        if risk >= remove_threshold:
-            edges_to_remove.append((u, v, k))
-        elif risk > 0:
-            data["length"] = data.get("length", 1) * (1 + risk * penalty_factor)
+    keys = coord_arrays(G)["keys"]
+    edges = edge_arrays(G)
+    risk = edges["flood_risk"]
+    lengths = penalized_lengths(edges["length"], risk, penalty_factor, remove_threshold)
+
+    remove = risk >= remove_threshold
+    edges_to_remove = [keys[i] for i in np.flatnonzero(remove)]
+    penalised = np.flatnonzero((risk > 0) & ~remove)
+    nx.set_edge_attributes(
+        G, {keys[i]: w for i, w in zip(penalised, lengths[penalised].tolist())}, "length"
+    )
 
     G.remove_edges_from(edges_to_remove)
+    G.graph.pop("_coords", None)
     print(
         f"[ROAD] Removed {len(edges_to_remove)} impassable edges; "
         f"penalised remaining risky edges (x{penalty_factor})"
@@ -163,6 +225,44 @@ def penalize_flooded_edges(
     return G
 
 
+def edge_arrays(G: nx.MultiDiGraph) -> dict:
+    """
+    Contiguous columns of the hot edge attributes, in G.edges() order:
+    u/v as dense node indices into "nodes" (from coord_arrays), plus
+    length and flood_risk.  One pass over the edge dicts; everything
+    downstream is vector ops.
+    """
+    coords = coord_arrays(G)
+    m = len(coords["keys"])
+    cols = np.array(
+        [(d.get("length", 1), d.get("flood_risk", 0.0)) for _, _, d in G.edges(data=True)],
+        dtype=np.float64,
+    ).reshape(m, 2)
+    return {
+        "nodes": coords["nodes"],
+        "u": coords["u"],
+        "v": coords["v"],
+        "length": cols[:, 0].copy(),
+        "flood_risk": cols[:, 1].copy(),
+    }
+
+
+def penalized_lengths(
+    length: np.ndarray,
+    flood_risk: np.ndarray,
+    penalty_factor: float = config.FLOOD_RISK_PENALTY_FACTOR,
+    remove_threshold: float = config.HIGH_RISK_ROAD_THRESHOLD,
+) -> np.ndarray:
+    """
+    Flood-penalised edge lengths over edge_arrays() columns, with the
+    same semantics as penalize_flooded_edges() but without mutating the
+    graph.  Impassable edges are NaN.
+    """
+    w = np.where(flood_risk > 0, length * (1 + flood_risk * penalty_factor), length)
+    w[flood_risk >= remove_threshold] = np.nan
+    return w
+
+
 # ── Safe-zone detection ─────────────────────────────────────────────────────
 
 def label_safe_nodes(
@@ -174,23 +274,26 @@ def label_safe_nodes(
     Tag each node with is_safe=True if the FSI at its location < safe_threshold.
     These are candidate escape destinations.
     """
-    with rasterio.open(risk_tif_path) as src:
-        transform = src.transform
-        band = src.read(1)
-        rows, cols = band.shape
-
-    n_safe = 0
-    for node, data in G.nodes(data=True):
-        col_idx, row_idx = ~transform * (data["x"], data["y"])
-        row_idx, col_idx = int(round(row_idx)), int(round(col_idx))
-        if 0 <= row_idx < rows and 0 <= col_idx < cols:
-            fsi = float(band[row_idx, col_idx])
-        else:
-            fsi = 0.0
-        data["fsi"] = fsi
-        data["is_safe"] = fsi < safe_threshold
-        if data["is_safe"]:
-            n_safe += 1
-
-    print(f"[ROAD] Safe-zone nodes: {n_safe}/{G.number_of_nodes()} (FSI < {safe_threshold})")
+    fsi, is_safe = safe_node_arrays(G, risk_tif_path, safe_threshold)
+    for (_, data), v, safe in zip(G.nodes(data=True), fsi.tolist(), is_safe.tolist()):
+        data["fsi"] = v
+        data["is_safe"] = safe
     return G
+
+
+def safe_node_arrays(
+    G: nx.MultiDiGraph,
+    risk_tif_path: str,
+    safe_threshold: float = 0.3,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    label_safe_nodes() without touching G: per-node (fsi, is_safe) arrays
+    in coord_arrays(G)["nodes"] order, for find_escape_route(fsi=, is_safe=).
+    """
+    coords = coord_arrays(G)
+    with rasterio.open(risk_tif_path) as src:
+        fsi = _sample_points(src, coords["lon"], coords["lat"])
+    is_safe = fsi < safe_threshold
+
+    print(f"[ROAD] Safe-zone nodes: {int(is_safe.sum())}/{len(fsi)} (FSI < {safe_threshold})")
+    return fsi, is_safe
@@ -2,13 +2,18 @@
 Visualization Module – Interactive Folium/Leaflet 2D risk map.
 """
 
+import io
 import os
+import base64
 import folium
+import matplotlib
 import rasterio
 import numpy as np
 from folium.plugins import MiniMap
+from PIL import Image
 
 import config
+from src.road_network import coord_arrays, edge_arrays
 
 
 def create_risk_map(
@@ -87,10 +92,6 @@ def create_risk_map(
 
 def _add_risk_overlay(m: folium.Map, tif_path: str):
     """Render the flood risk GeoTIFF as an ImageOverlay."""
-    from matplotlib import cm
-    from PIL import Image
-    import io, base64
-
     with rasterio.open(tif_path) as src:
         band = src.read(1)
         bounds = src.bounds  # left, bottom, right, top
@@ -102,14 +103,18 @@ def _add_risk_overlay(m: folium.Map, tif_path: str):
     else:
         norm = np.zeros_like(band)
 
-    # Apply RdYlGn_r colourmap (red = high risk)
-    cmap = cm.get_cmap("RdYlGn_r")
-    rgba = cmap(norm)
-    rgba[..., 3] = np.where(np.isnan(band), 0, 0.6)  # transparency
+    # Apply RdYlGn_r colourmap (red = high risk) as a palette image:
+    # indices 0–254 are the ramp, 255 is transparent NoData
+    cmap = matplotlib.colormaps["RdYlGn_r"]
+    palette = (cmap(np.linspace(0, 1, 255))[:, :3] * 255).astype(np.uint8)
+    idx = np.rint(np.nan_to_num(norm) * 254).astype(np.uint8)
+    idx[np.isnan(band)] = 255
 
-    img = Image.fromarray((rgba * 255).astype(np.uint8))
+    img = Image.fromarray(idx)
+    img.putpalette(np.vstack([palette, [[0, 0, 0]]]).ravel().tolist())
+    img.info["transparency"] = bytes([153] * 255 + [0])  # 0.6 alpha, NoData clear
     buf = io.BytesIO()
-    img.save(buf, format="PNG")
+    img.save(buf, format="PNG", compress_level=1)
     encoded = base64.b64encode(buf.getvalue()).decode()
 
     folium.raster_layers.ImageOverlay(
@@ -121,14 +126,25 @@ def _add_risk_overlay(m: folium.Map, tif_path: str):
 
 
 def _add_road_layer(m: folium.Map, G):
-    """Draw road edges as thin grey lines."""
+    """Draw road edges as thin lines, one MultiPolyline per risk colour."""
+    coords = coord_arrays(G)
+    lat, lon = coords["lat"], coords["lon"]
+    edges = edge_arrays(G)
+    u, v, risk = edges["u"], edges["v"], edges["flood_risk"]
+    # (n_edges, 2 endpoints, lat/lon)
+    segments = np.stack([np.column_stack([lat[u], lon[u]]),
+                         np.column_stack([lat[v], lon[v]])], axis=1)
+
     road_group = folium.FeatureGroup(name="Roads")
-    for u, v, data in G.edges(data=True):
-        pts = [
-            (G.nodes[u]["y"], G.nodes[u]["x"]),
-            (G.nodes[v]["y"], G.nodes[v]["x"]),
-        ]
-        risk = data.get("flood_risk", 0)
-        color = "#e53935" if risk > 0.7 else "#ff9800" if risk > 0.4 else "#9e9e9e"
-        folium.PolyLine(pts, color=color, weight=2, opacity=0.7).add_to(road_group)
+    buckets = [
+        # NaN risk (unsampled edge) fails every comparison – keep it grey
+        ("#9e9e9e", ~(risk > 0.4)),
+        ("#ff9800", (risk > 0.4) & (risk <= 0.7)),
+        ("#e53935", risk > 0.7),
+    ]
+    for color, mask in buckets:
+        if mask.any():
+            folium.PolyLine(
+                segments[mask].tolist(), color=color, weight=2, opacity=0.7
+            ).add_to(road_group)
     road_group.add_to(m)
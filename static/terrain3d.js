@@ -16,38 +16,36 @@ let currentData = null;
 /**
  * Professional FSI color ramp (inspired by Esri's Green-Yellow-Red scheme)
  * Smooth gradients, muted tones, suitable for scientific presentation
+ *
+ * Three linear segments as coefficient tables (start, width, base RGB,
+ * RGB delta, pre-divided by 255), so a lookup is one segment index and
+ * three multiply-adds instead of a branch per segment.
+ *   Low:    Forest green (34,139,34) → Lime green (124,179,66)
+ *   Medium: Lime green → Gold (255,215,0)
+ *   High:   Gold → Fire brick (178,34,34)
  */
-function getFSIColor(fsi) {
+const FSI_SEG_START = [0, 0.33, 0.66];
+const FSI_SEG_WIDTH = [0.33, 0.33, 0.34];
+const FSI_SEG_BASE = new Float32Array([
+    34, 139, 34,   124, 179, 66,   255, 215, 0,
+].map(v => v / 255));
+const FSI_SEG_DELTA = new Float32Array([
+    90, 40, 32,    131, 36, -66,   -77, -181, 34,
+].map(v => v / 255));
+
+/**
+ * Write the FSI colour, scaled by shade, into out[offset..offset+2]
+ * (no per-vertex object allocation).
+ */
+function writeFSIColor(fsi, shade, out, offset) {
     // Clamp FSI to [0, 1]
     const t = Math.max(0, Math.min(1, fsi));
-    
-    let r, g, b;
-    
-    if (t < 0.33) {
-        // Low risk: Forest green (34,139,34) → Lime green (124,179,66)
-        const s = t / 0.33;
-        r = 34 + s * 90;
-        g = 139 + s * 40;
-        b = 34 + s * 32;
-    } else if (t < 0.66) {
-        // Medium risk: Lime green → Gold (255,215,0)
-        const s = (t - 0.33) / 0.33;
-        r = 124 + s * 131;
-        g = 179 + s * 36;
-        b = 66 - s * 66;
-    } else {
-        // High risk: Gold → Fire brick (178,34,34)
-        const s = (t - 0.66) / 0.34;
-        r = 255 - s * 77;
-        g = 215 - s * 181;
-        b = s * 34;
-    }
-    
-    return {
-        r: r / 255,
-        g: g / 255,
-        b: b / 255
-    };
+    const seg = (t >= 0.33) + (t >= 0.66);
+    const s = (t - FSI_SEG_START[seg]) / FSI_SEG_WIDTH[seg];
+    const k = seg * 3;
+    out[offset]     = (FSI_SEG_BASE[k]     + s * FSI_SEG_DELTA[k])     * shade;
+    out[offset + 1] = (FSI_SEG_BASE[k + 1] + s * FSI_SEG_DELTA[k + 1]) * shade;
+    out[offset + 2] = (FSI_SEG_BASE[k + 2] + s * FSI_SEG_DELTA[k + 2]) * shade;
 }
 
 /**
@@ -201,10 +199,30 @@ function onWindowResize() {
 
 // ── Terrain Construction ────────────────────────────────────────────────────
 
+/**
+ * Decode a base64 little-endian integer grid into row views of a
+ * Float32Array: value = offset + q * scale, indexable as grid[r][c]
+ */
+function decodeGrid(b64, ArrayType, rows, cols, offset, scale) {
+    const bin = atob(b64);
+    const bytes = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    
+    const q = new ArrayType(bytes.buffer);
+    const flat = new Float32Array(rows * cols);
+    for (let i = 0; i < flat.length; i++) flat[i] = offset + q[i] * scale;
+    
+    const grid = new Array(rows);
+    for (let r = 0; r < rows; r++) grid[r] = flat.subarray(r * cols, (r + 1) * cols);
+    return grid;
+}
+
 function buildTerrain(data) {
     console.log('[3D] Building terrain mesh...');
     
-    const { dem, fsi, dem_rows, dem_cols, fsi_rows, fsi_cols, dem_min, dem_max, dem_mean, dem_std, bounds } = data;
+    const { dem_rows, dem_cols, fsi_rows, fsi_cols, dem_min, dem_max, dem_mean, dem_std, bounds } = data;
+    const dem = decodeGrid(data.dem_b64, Uint16Array, dem_rows, dem_cols, data.dem_offset, data.dem_scale);
+    const fsi = decodeGrid(data.fsi_b64, Uint8Array, fsi_rows, fsi_cols, 0, data.fsi_scale);
     
     currentData = data;
     
@@ -254,9 +272,6 @@ function buildTerrain(data) {
             // Sample FSI for this vertex (bilinear interpolation)
             const fsiValue = sampleFSI(row, col, rows, cols, fsi, fsi_rows, fsi_cols);
             
-            // Get base FSI color
-            const fsiColor = getFSIColor(fsiValue);
-            
             // Compute hillshade for realistic shading
             const hillshade = computeHillshade(dem, row, col, rows, cols, cellSize / verticalScale);
             
@@ -264,9 +279,8 @@ function buildTerrain(data) {
             const hillshadeStrength = 0.35;  // How much hillshade affects color
             const shadeFactor = 1 - hillshadeStrength + hillshade * hillshadeStrength;
             
-            colors[i * 3]     = fsiColor.r * shadeFactor;
-            colors[i * 3 + 1] = fsiColor.g * shadeFactor;
-            colors[i * 3 + 2] = fsiColor.b * shadeFactor;
+            // FSI color, shaded
+            writeFSIColor(fsiValue, shadeFactor, colors, i * 3);
         }
     }
     
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import ee
 ee.Authenticate()
 ee.Initialize(project='gisproj-487215')
@@ -15,6 +17,17 @@ slope = ee.Terrain.slope(dem)
 aoi = ee.Geometry.Point([78.4867, 17.3850]).buffer(10000)
 
 
+# getInfo() memoised on the serialised expression, so re-running cells
+# (or repeating a query) doesn't cost another round-trip
+@lru_cache(maxsize=4096)
+def _gi(serialized):
+    return ee.deserializer.fromJSON(serialized).getInfo()
+
+
+def cached_getinfo(obj):
+    return _gi(obj.serialize())
+
+
 # clay = clay.clip(aoi)
 # bdod = bdod.clip(aoi)
 # awc  = awc.clip(aoi)
@@ -32,20 +45,18 @@ clay = ee.Image("OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02") \
           .select("b0") \
           .clip(test_point.buffer(10000))
 
-# Print band info
-print("Clay band names:", clay.bandNames().getInfo())
-
 sand = ee.Image("OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02") \
           .select("b0") \
           .clip(test_point.buffer(10000))
 
-print("Sand band names:", sand.bandNames().getInfo())
-
 bulk = ee.Image("OpenLandMap/SOL/SOL_BULKDENS-FINEEARTH_USDA-4A1H_M/v02") \
           .select("b0") \
           .clip(test_point.buffer(10000))
 
-print("Bulk density band names:", bulk.bandNames().getInfo())
+# Band info
+clay_bands = clay.bandNames()
+sand_bands = sand.bandNames()
+bulk_bands = bulk.bandNames()
 
 
 clay = ee.Image("OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02") \
@@ -56,9 +67,6 @@ sand = ee.Image("OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02") \
         .select("b0") \
         .clip(aoi)
 
-print("Clay projection:", clay.projection().getInfo())
-print("Sand projection:", sand.projection().getInfo())
-
 
 
 stats_clay = clay.reduceRegion(
@@ -75,28 +83,20 @@ stats_sand = sand.reduceRegion(
     maxPixels=1e9
 )
 
-print("Clay min/max:", stats_clay.getInfo())
-print("Sand min/max:", stats_sand.getInfo())
-
 
 
-sample_points = clay.sample(
+sample_points_clay = clay.sample(
     region=aoi,
     scale=250,
     numPixels=5
 )
 
-print("Sample clay pixels:", sample_points.getInfo())
-
-
-sample_points = sand.sample(
+sample_points_sand = sand.sample(
     region=aoi,
     scale=250,
     numPixels=5
 )
 
-print("Sample clay pixels:", sample_points.getInfo())
-
 clay_norm = clay.divide(100)
 sand_norm = sand.divide(100)
 
@@ -111,4 +111,28 @@ dem_250 = dem \
         crs="EPSG:4326",
         scale=250
     )
-print(dem_250.projection().getInfo())
+
+# All diagnostics in one round-trip
+diagnostics = cached_getinfo(ee.Dictionary({
+    "clay_bands": clay_bands,
+    "sand_bands": sand_bands,
+    "bulk_bands": bulk_bands,
+    "clay_proj": clay.projection(),
+    "sand_proj": sand.projection(),
+    "clay_stats": stats_clay,
+    "sand_stats": stats_sand,
+    "clay_sample": sample_points_clay,
+    "sand_sample": sample_points_sand,
+    "dem250_proj": dem_250.projection(),
+}))
+
+print("Clay band names:", diagnostics["clay_bands"])
+print("Sand band names:", diagnostics["sand_bands"])
+print("Bulk density band names:", diagnostics["bulk_bands"])
+print("Clay projection:", diagnostics["clay_proj"])
+print("Sand projection:", diagnostics["sand_proj"])
+print("Clay min/max:", diagnostics["clay_stats"])
+print("Sand min/max:", diagnostics["sand_stats"])
+print("Sample clay pixels:", diagnostics["clay_sample"])
+print("Sample sand pixels:", diagnostics["sand_sample"])
+print(diagnostics["dem250_proj"])
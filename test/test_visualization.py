@@ -0,0 +1,84 @@
+"""Risk overlay and road layer rendering in src/visualization.py."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+folium = pytest.importorskip("folium")
+nx = pytest.importorskip("networkx")
+pytest.importorskip("osmnx")
+
+from src.visualization import _add_road_layer
+
+
+def _road_lines(m):
+    """{colour: list of segments} of the PolyLines in the map's Roads layer."""
+    group = next(c for c in m._children.values()
+                 if isinstance(c, folium.FeatureGroup) and c.layer_name == "Roads")
+    return {line.options["color"]: line.locations
+            for line in group._children.values() if isinstance(line, folium.PolyLine)}
+
+
+def test_nan_risk_edge_drawn_grey():
+    G = nx.MultiDiGraph()
+    G.add_node(1, x=78.0, y=17.0)
+    G.add_node(2, x=78.1, y=17.1)
+    G.add_node(3, x=78.2, y=17.2)
+    G.add_edge(1, 2, length=10.0, flood_risk=np.nan)
+    G.add_edge(2, 3, length=10.0, flood_risk=0.9)
+
+    m = folium.Map(location=[17.1, 78.1])
+    _add_road_layer(m, G)
+    lines = _road_lines(m)
+
+    assert lines["#9e9e9e"] == [[[17.0, 78.0], [17.1, 78.1]]]
+    assert lines["#e53935"] == [[[17.1, 78.1], [17.2, 78.2]]]
+    assert "#ff9800" not in lines
+
+
+def _risk_tif(tmp_path, band):
+    import rasterio
+    from rasterio.transform import from_bounds
+
+    path = str(tmp_path / "risk.tif")
+    rows, cols = band.shape
+    with rasterio.open(
+        path, "w", driver="GTiff", height=rows, width=cols, count=1,
+        dtype="float32", crs="EPSG:4326",
+        transform=from_bounds(78.0, 17.0, 78.1, 17.1, cols, rows), nodata=np.nan,
+    ) as dst:
+        dst.write(band.astype(np.float32), 1)
+    return path
+
+
+def test_risk_overlay_renders_colour_ramp(tmp_path):
+    import base64, io
+    import matplotlib
+    from PIL import Image
+    from src.visualization import _add_risk_overlay
+
+    rng = np.random.default_rng(0)
+    band = rng.random((40, 60)).astype(np.float32)
+    band[5:9, 10:20] = np.nan
+    m = folium.Map(location=[17.05, 78.05])
+    _add_risk_overlay(m, _risk_tif(tmp_path, band))
+
+    overlay = next(c for c in m._children.values()
+                   if isinstance(c, folium.raster_layers.ImageOverlay))
+    assert overlay.bounds == [[17.0, 78.0], [17.1, 78.1]]
+    assert overlay.url in m.get_root().render()
+    png = base64.b64decode(overlay.url.split(",", 1)[1])
+    rgba = np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"), dtype=np.int16)
+    assert rgba.shape == (40, 60, 4)
+
+    # Same colours as mapping the normalised risk through the full
+    # colourmap, to within the 255-step palette quantisation
+    norm = (band - np.nanmin(band)) / (np.nanmax(band) - np.nanmin(band))
+    expected = (matplotlib.colormaps["RdYlGn_r"](np.nan_to_num(norm))[..., :3] * 255).astype(np.int16)
+    valid = ~np.isnan(band)
+    assert np.abs(rgba[..., :3][valid] - expected[valid]).max() <= 3
+    assert (rgba[..., 3][valid] == 153).all()
+    assert (rgba[..., 3][~valid] == 0).all()
@@ -5,20 +5,26 @@ Tests 7 geographically distinct regions × 2 rainfall scenarios.
 Prints structured summary table + per-location diagnostics.
 """
 import sys, os, time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 sys.path.insert(0, os.path.dirname(__file__))
 
 import config
-from src.gee_data import initialize_ee, create_aoi, fetch_dem, compute_slope, fetch_soil, ee_image_to_numpy
-from src.preprocessing import normalize_elevation, normalize_slope, compute_soil_index
+from src.gee_data import (
+    initialize_ee, create_aoi, fetch_dem, compute_slope, fetch_soil, ee_image_to_numpy,
+    aoi_pixel_mask,
+)
+from src.preprocessing import normalize_elevation, normalize_slope, compute_soil_index, terrain_min_max
 from src.hydrology import (
-    fetch_water_features, compute_river_proximity,
+    fetch_water_features, compute_river_proximity, raster_shape,
     compute_flow_accumulation, normalize_flow_accumulation,
     numpy_to_ee_image,
 )
 from src.ahp import get_validated_weights
-from src.flood_model import compute_base_risk, apply_rainfall_multiplier, apply_water_mask, classify_risk
+from src.flood_model import compute_base_risk, compute_fsi, classify_risk
 import ee
 import numpy as np
+from rasterio.transform import from_bounds
 
 # ── Test Locations ──────────────────────────────────────────────────────────
 LOCATIONS = [
@@ -35,138 +41,253 @@ RAINFALL_SCENARIOS = [10, 150]
 RADIUS_KM = 10
 
 
+@lru_cache(maxsize=4096)
+def _getinfo_serialized(serialized):
+    return ee.deserializer.fromJSON(serialized).getInfo()
+
+
+def cached_getinfo(obj):
+    """obj.getInfo(), memoised on the serialised expression graph."""
+    return _getinfo_serialized(obj.serialize())
+
+
 def get_stats(image, aoi, band_name=None):
-    """Get min/max/mean from an EE image over an AOI."""
-    stats = image.reduceRegion(
+    """
+    Lazy min/max/mean of a single-band EE image over an AOI (ee.Dictionary
+    keyed <band>_min / <band>_max / <band>_mean).
+    """
+    return image.reduceRegion(
         reducer=ee.Reducer.minMax().combine(ee.Reducer.mean(), sharedInputs=True),
         geometry=aoi,
         scale=config.EXPORT_SCALE,
         maxPixels=config.MAX_PIXELS,
-    ).getInfo()
-    return stats
+        tileScale=config.TILE_SCALE,
+    )
 
 
-def get_class_pct(risk_class, aoi, cls_val):
-    """Get percentage of pixels in a given class."""
-    count = risk_class.eq(cls_val).reduceRegion(
-        reducer=ee.Reducer.sum(), geometry=aoi,
-        scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
-    )
-    total = risk_class.gte(0).reduceRegion(
-        reducer=ee.Reducer.sum(), geometry=aoi,
-        scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS,
+def _min_max_mean(stats):
+    """(min, max, mean) from a fetched get_stats() result."""
+    def pick(suffix):
+        return next(v for k, v in stats.items() if k.endswith(suffix))
+    return pick("_min"), pick("_max"), pick("_mean")
+
+
+def local_stats(array, bounds, lat, lon, radius_km):
+    """
+    (min, max, mean) of a local factor grid over the circular AOI.
+
+    numpy_to_ee_image() stretches the array over *bounds*, so this is the
+    same pixel set get_stats() would reduce server-side – without the
+    upload-then-reduce round-trip.
+    """
+    rows, cols = array.shape
+    inside = aoi_pixel_mask(lat, lon, radius_km, from_bounds(*bounds, cols, rows), (rows, cols))
+    vals = array[inside]
+    return float(np.nanmin(vals)), float(np.nanmax(vals)), float(np.nanmean(vals))
+
+
+def get_class_hist(risk_class, aoi):
+    """Lazy {class value: pixel count} of a classified image (ee.Dictionary)."""
+    hist = risk_class.reduceRegion(
+        reducer=ee.Reducer.frequencyHistogram(), geometry=aoi,
+        scale=config.EXPORT_SCALE, maxPixels=config.MAX_PIXELS, tileScale=config.TILE_SCALE,
     )
-    c = ee.Number(count.values().get(0)).getInfo()
-    t = ee.Number(total.values().get(0)).getInfo()
-    return (c / t * 100) if t > 0 else 0
+    return ee.Dictionary(hist.values().get(0))
 
 
-def validate_location(loc, ahp_weights):
-    """Run full validation for one location, returns results dict."""
-    name = loc["name"]
-    lat, lon = loc["lat"], loc["lon"]
+def _class_pct(hist, cls_val):
+    """Percentage of pixels in a class from a fetched get_class_hist() result."""
+    total = sum(hist.values())
+    return (hist.get(str(cls_val), 0) / total * 100) if total > 0 else 0
 
-    print(f"\n{'='*70}")
-    print(f"  📍 {name}  ({lat}, {lon})")
-    print(f"{'='*70}")
 
-    aoi = create_aoi(lat, lon, RADIUS_KM)
+def hydro_asset_id(lat, lon, radius_km):
+    """Asset ID of a location's pre-built hydrology layers (prebuild_assets.py)."""
+    return f"{config.GEE_ASSET_ROOT}/hydro_{round(lat * 1e4)}_{round(lon * 1e4)}_{radius_km}km"
+
+
+def _load_hydro_asset(lat, lon, radius_km):
+    """
+    Pre-built (river_factor, water_mask, flow_accum_factor[, soil_factor])
+    image and its band names, or (None, ()).
+    """
+    if not config.GEE_ASSET_ROOT:
+        return None, ()
+    asset_id = hydro_asset_id(lat, lon, radius_km)
+    try:
+        info = ee.data.getAsset(asset_id)
+    except ee.EEException:
+        return None, ()
+    return ee.Image(asset_id), tuple(b.get("id") for b in info.get("bands", []))
+
+
+@lru_cache(maxsize=None)
+def _prepare_location(lat, lon, radius_km, use_assets=True):
+    """
+    Everything for a location that does not depend on rainfall or AHP
+    weights: (aoi, (elev, slope, soil, river, flow_accum) factor images,
+    water mask image, local river/flow factor stats, warning lines).
+    Memoised on (lat, lon, radius_km), so repeated validations in one
+    session skip the OSM fetch, DEM download, flow accumulation and
+    numpy → EE uploads.
+
+    With use_assets and a pre-built hydrology asset under
+    config.GEE_ASSET_ROOT, the three hydrology layers are loaded from it
+    instead; the factor stats are then None (reduce them server-side).
+    The soil index is static too, so it is read from the asset when the
+    asset carries a soil_factor band.
+    """
+    aoi, bounds = create_aoi(lat, lon, radius_km, with_bounds=True)
+    hydro, hydro_bands = _load_hydro_asset(lat, lon, radius_km) if use_assets else (None, ())
 
     # Terrain
     dem = fetch_dem(aoi)
     slope = compute_slope(dem)
-    clay, sand = fetch_soil(aoi)
-    elev_factor = normalize_elevation(dem, aoi)
-    slope_factor = normalize_slope(slope, aoi)
-    soil_factor = compute_soil_index(clay, sand)
+    terrain_stats = terrain_min_max(dem, slope, aoi)
+    elev_factor = normalize_elevation(dem, aoi, terrain_stats)
+    slope_factor = normalize_slope(slope, aoi, terrain_stats)
+    if "soil_factor" in hydro_bands:
+        soil_factor = hydro.select("soil_factor")
+    else:
+        clay, sand = fetch_soil(aoi)
+        soil_factor = compute_soil_index(clay, sand)
+
+    if hydro is not None:
+        factors = (elev_factor, slope_factor, soil_factor,
+                   hydro.select("river_factor"), hydro.select("flow_accum_factor"))
+        return aoi, factors, hydro.select("water_mask"), None, ()
 
     # Hydrology
+    warnings = []
     try:
-        water_gdf = fetch_water_features(lat, lon, RADIUS_KM * 1000)
+        water_gdf = fetch_water_features(lat, lon, radius_km * 1000)
     except Exception as e:
-        print(f"  ⚠️  Water features failed: {e}")
+        warnings.append(f"  ⚠️  Water features failed: {e}")
         water_gdf = None
 
-    aoi_bounds_info = aoi.bounds().getInfo()["coordinates"][0]
-    lons = [p[0] for p in aoi_bounds_info]
-    lats = [p[1] for p in aoi_bounds_info]
-    bounds = (min(lons), min(lats), max(lons), max(lats))
-
     if water_gdf is not None and not water_gdf.empty:
         river_array, water_mask_np, river_meta = compute_river_proximity(water_gdf, bounds)
     else:
-        import math
-        mid_lat = (bounds[1] + bounds[3]) / 2
-        deg_per_pixel_lon = config.EXPORT_SCALE / (111_320 * math.cos(math.radians(mid_lat)))
-        deg_per_pixel_lat = config.EXPORT_SCALE / 111_320
-        width = max(1, int((bounds[2] - bounds[0]) / deg_per_pixel_lon))
-        height = max(1, int((bounds[3] - bounds[1]) / deg_per_pixel_lat))
+        height, width = raster_shape(bounds)
         river_array = np.zeros((height, width), dtype=np.float32)
         water_mask_np = np.zeros((height, width), dtype=np.uint8)
 
     river_factor_ee = numpy_to_ee_image(river_array, bounds, "river_factor")
-    water_mask_ee = numpy_to_ee_image(water_mask_np.astype(float), bounds, "water_mask")
+    water_mask_ee = numpy_to_ee_image(water_mask_np, bounds, "water_mask")
 
-    dem_np = ee_image_to_numpy(dem, aoi)
+    dem_np = ee_image_to_numpy(dem, aoi, bounds=bounds)
     flow_accum_raw = compute_flow_accumulation(dem_np)
     flow_accum_norm = normalize_flow_accumulation(flow_accum_raw)
     flow_accum_ee = numpy_to_ee_image(flow_accum_norm, bounds, "flow_accum_factor")
 
-    # Factor diagnostics
-    print(f"\n  ── Factor Diagnostics ──")
-    for factor, label in [
-        (river_factor_ee, "RiverFactor"),
-        (flow_accum_ee, "FlowFactor"),
-    ]:
-        s = get_stats(factor, aoi)
-        vals = list(s.values())
-        print(f"    {label:15s}: min={vals[0]:.4f}  max={vals[1]:.4f}  mean={vals[2]:.4f}"
-              f"  {'⚠️ CONSTANT' if abs(vals[1] - vals[0]) < 0.001 else '✅ varies'}")
-
-    # BaseRisk
+    factors = (elev_factor, slope_factor, soil_factor, river_factor_ee, flow_accum_ee)
+    diagnostics = {
+        "river": local_stats(river_array, bounds, lat, lon, radius_km),
+        "flow": local_stats(flow_accum_norm, bounds, lat, lon, radius_km),
+    }
+    return aoi, factors, water_mask_ee, diagnostics, tuple(warnings)
+
+
+def build_location(loc, ahp_weights):
+    """
+    Prepare one location and build – without fetching – every reduction it
+    needs as one lazy ee.Dictionary.  Returns a dict for
+    summarise_location(): loc, factor diagnostics, warning lines, batch.
+    """
+    lat, lon = loc["lat"], loc["lon"]
+    aoi, factors, water_mask_ee, diagnostics, warnings = _prepare_location(lat, lon, RADIUS_KM)
+    elev_factor, slope_factor, soil_factor, river_factor_ee, flow_accum_ee = factors
+
+    # BaseRisk + rainfall scenarios (lazy graphs only)
     base_risk = compute_base_risk(
         elev_factor, slope_factor, soil_factor,
         river_factor=river_factor_ee,
         flow_accum_factor=flow_accum_ee,
         weights=ahp_weights,
     )
-    br = get_stats(base_risk, aoi)
-    br_vals = list(br.values())
-    print(f"    {'BaseRisk':15s}: min={br_vals[0]:.4f}  max={br_vals[1]:.4f}  mean={br_vals[2]:.4f}")
+
+    batch = {"base": get_stats(base_risk, aoi)}
+    if diagnostics is None:
+        batch["river"] = get_stats(river_factor_ee, aoi)
+        batch["flow"] = get_stats(flow_accum_ee, aoi)
+    for rain_mm in RAINFALL_SCENARIOS:
+        fsi = compute_fsi(base_risk, water_mask_ee, rain_mm)
+        batch[f"fsi_{rain_mm}"] = get_stats(fsi, aoi)
+        batch[f"classes_{rain_mm}"] = get_class_hist(classify_risk(fsi), aoi)
+
+    return {
+        "loc": loc,
+        "diagnostics": diagnostics,
+        "warnings": warnings,
+        "batch": ee.Dictionary(batch),
+    }
+
+
+def summarise_location(built, fetched):
+    """
+    Turn a build_location() result and its fetched batch into the results
+    rows, printing the location's diagnostics as one block (locations are
+    built concurrently, so line-by-line prints would interleave).
+    """
+    loc = built["loc"]
+    name = loc["name"]
+    diagnostics = built["diagnostics"]
+    if diagnostics is None:
+        diagnostics = {k: _min_max_mean(fetched[k]) for k in ("river", "flow")}
+
+    report = []
+    say = report.append
+    say(f"\n{'='*70}")
+    say(f"  📍 {name}  ({loc['lat']}, {loc['lon']})")
+    say(f"{'='*70}")
+    report.extend(built["warnings"])
+
+    # Factor diagnostics
+    say(f"\n  ── Factor Diagnostics ──")
+    for key, label in [("river", "RiverFactor"), ("flow", "FlowFactor")]:
+        vmin, vmax, vmean = diagnostics[key]
+        say(f"    {label:15s}: min={vmin:.4f}  max={vmax:.4f}  mean={vmean:.4f}"
+            f"  {'⚠️ CONSTANT' if abs(vmax - vmin) < 0.001 else '✅ varies'}")
+
+    br_min, br_max, br_mean = _min_max_mean(fetched["base"])
+    say(f"    {'BaseRisk':15s}: min={br_min:.4f}  max={br_max:.4f}  mean={br_mean:.4f}")
 
     # Rainfall scenarios
     results = []
     for rain_mm in RAINFALL_SCENARIOS:
         rf = (min(rain_mm / config.RAIN_MAX, 1.0)) ** config.RAIN_ALPHA
-        fsi = apply_rainfall_multiplier(base_risk, rain_mm)
-        fsi = apply_water_mask(fsi, water_mask_ee, rain_mm)
-
-        fsi_stats = get_stats(fsi, aoi)
-        fsi_vals = list(fsi_stats.values())
+        fsi_min, fsi_max, fsi_mean = _min_max_mean(fetched[f"fsi_{rain_mm}"])
 
-        risk_class = classify_risk(fsi)
-        pct_low = get_class_pct(risk_class, aoi, 1)
-        pct_med = get_class_pct(risk_class, aoi, 2)
-        pct_high = get_class_pct(risk_class, aoi, 3)
+        hist = fetched[f"classes_{rain_mm}"]
+        pct_low = _class_pct(hist, 1)
+        pct_med = _class_pct(hist, 2)
+        pct_high = _class_pct(hist, 3)
 
-        print(f"\n  ── Rain = {rain_mm}mm  (RainFactor = {rf:.4f}) ──")
-        print(f"    FSI: min={fsi_vals[0]:.4f}  max={fsi_vals[1]:.4f}  mean={fsi_vals[2]:.4f}")
-        print(f"    Low:  {pct_low:5.1f}%  |  Medium: {pct_med:5.1f}%  |  High: {pct_high:5.1f}%")
+        say(f"\n  ── Rain = {rain_mm}mm  (RainFactor = {rf:.4f}) ──")
+        say(f"    FSI: min={fsi_min:.4f}  max={fsi_max:.4f}  mean={fsi_mean:.4f}")
+        say(f"    Low:  {pct_low:5.1f}%  |  Medium: {pct_med:5.1f}%  |  High: {pct_high:5.1f}%")
 
         results.append({
             "location": name,
             "rain_mm": rain_mm,
-            "fsi_min": fsi_vals[0],
-            "fsi_max": fsi_vals[1],
-            "fsi_mean": fsi_vals[2],
+            "fsi_min": fsi_min,
+            "fsi_max": fsi_max,
+            "fsi_mean": fsi_mean,
             "pct_low": pct_low,
             "pct_med": pct_med,
             "pct_high": pct_high,
         })
 
+    print("\n".join(report))
     return results
 
 
+def validate_location(loc, ahp_weights):
+    """Run full validation for one location (one getInfo()), returns results rows."""
+    built = build_location(loc, ahp_weights)
+    return summarise_location(built, cached_getinfo(built["batch"]))
+
+
 def main():
     print("=" * 70)
     print("  MULTI-LOCATION FLOOD MODEL VALIDATION")
@@ -178,15 +299,43 @@ def main():
     initialize_ee()
     ahp_weights = get_validated_weights()
 
+    # Preparing a location is OSM / DEM downloads plus local numpy work;
+    # run them concurrently (one ee session, shared across threads)
+    built = []
+    with ThreadPoolExecutor(max_workers=len(LOCATIONS)) as pool:
+        futures = [pool.submit(build_location, loc, ahp_weights) for loc in LOCATIONS]
+        for loc, future in zip(LOCATIONS, futures):
+            try:
+                built.append(future.result())
+            except Exception as e:
+                print(f"\n  ❌ FAILED: {loc['name']} – {e}")
+                import traceback
+                traceback.print_exception(e)
+
+    # Every statistic for every location in one getInfo(); if that single
+    # request fails, fetch per location so one bad AOI can't sink the rest
+    try:
+        fetched = cached_getinfo(ee.List([b["batch"] for b in built]))
+    except Exception as e:
+        print(f"\n  ⚠️  Batched fetch failed ({e}); fetching per location")
+        with ThreadPoolExecutor(max_workers=max(1, len(built))) as pool:
+            futures = [pool.submit(cached_getinfo, b["batch"]) for b in built]
+        fetched = []
+        for b, future in zip(built, futures):
+            try:
+                fetched.append(future.result())
+            except Exception as e:
+                print(f"\n  ❌ FAILED: {b['loc']['name']} – {e}")
+                fetched.append(None)
+
     all_results = []
-    for loc in LOCATIONS:
+    for b, f in zip(built, fetched):
+        if f is None:
+            continue
         try:
-            results = validate_location(loc, ahp_weights)
-            all_results.extend(results)
+            all_results.extend(summarise_location(b, f))
         except Exception as e:
-            print(f"\n  ❌ FAILED: {loc['name']} – {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"\n  ❌ FAILED: {b['loc']['name']} – {e}")
 
     # ── Summary Table ───────────────────────────────────────────────────────
     print(f"\n\n{'='*90}")
@@ -205,11 +354,14 @@ def main():
     print("  SANITY CHECKS")
     print(f"{'='*70}")
 
-    for loc_name in set(r["location"] for r in all_results):
-        r10 = [r for r in all_results if r["location"] == loc_name and r["rain_mm"] == 10]
-        r150 = [r for r in all_results if r["location"] == loc_name and r["rain_mm"] == 150]
+    # One pass to index rows by location → {rain_mm: row}
+    by_location = {}
+    for r in all_results:
+        by_location.setdefault(r["location"], {}).setdefault(r["rain_mm"], r)
+
+    for loc_name, by_rain in by_location.items():
+        r10, r150 = by_rain.get(10), by_rain.get(150)
         if r10 and r150:
-            r10, r150 = r10[0], r150[0]
             increase = r150["fsi_mean"] - r10["fsi_mean"]
             ok = increase > 0
             ten_mostly_low = r10["pct_low"] > 90
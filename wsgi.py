@@ -0,0 +1,18 @@
+"""
+wsgi.py – production entry point for the Flask GUI.
+
+    gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:5050 wsgi:app
+
+Jobs, overlay bytes and AHP weights live in process memory, so a job
+polled via /api/status must hit the process that started it: run a
+single worker and scale with threads. gthread (not gevent) because the
+pipeline is NumPy/numba-heavy and its GEE/OSM calls already overlap on
+the pipeline's own thread pool.
+
+Heavy imports, GEE auth and the numba kernel are warmed at import, so
+with --preload they are paid once before the worker forks.
+"""
+
+from app import app, prewarm  # noqa: F401
+
+prewarm()